@@ -1,23 +1,50 @@
-import requests 
+from __future__ import annotations
+
+import time
+_T0 = time.perf_counter() # Para medir el arranque en frío (hasta el primer pintado)
+
+import logging
+import queue
 import re
+import threading
 import tkinter as tk
 import tkinter.font as tkfont
 from tkinter import messagebox, simpledialog, ttk
-from models import ChessRecord, Session, reset_chess_records
-from OnlineChessAPI import map_result_for_player
-from datetime import datetime, timezone, date
-from sqlalchemy import text
+from config import MONTHS_TO_FETCH, RESET_ON_START
+from datetime import date
+import metrics
+
+# Importaciones pesadas (SQLAlchemy, requests) se difieren hasta su primer uso
+# para que la ventana aparezca de inmediato
+
+log = logging.getLogger("gamestatchess.app")
 
 # Constantes de la App
 APP_TITLE = "Registro de Partidas de Ajedrez - Chess.com"
-USER_AGENT = "ChessRecordApp/1.0 (contacto: paradigmshiftzu09@gmail.com)"
-MONTHS_TO_FETCH = 1
 LISTBOX_HEIGHT = 14
 PAD = 10
 
+# Vista por ventanas del Treeview: solo se cargan unas pocas páginas a la vez
+PAGE_SIZE = 200 # Filas por consulta (página)
+MAX_LOADED_ROWS = 3 * PAGE_SIZE # Tope de filas en el Treeview; el resto se descarta al desplazarse
+PREFETCH_MARGIN = 0.15 # Fracción del scroll cerca de un borde que dispara la carga de la página vecina
+
+# Barra de filtro
+FILTER_DEBOUNCE_MS = 250 # Espera tras la última tecla antes de consultar (cada tecla reinicia la espera)
+FILTER_MODES = {"empieza por": False, "contiene": True} # texto -> RecordFilter.contains
+FILTER_ALL_RESULTS = "Todos"
+
+# Sincronización en segundo plano
+SYNC_POLL_MS = 50 # Cada cuánto la UI lee el progreso del hilo de sincronización
+SYNC_JOIN_TIMEOUT = 5 # Segundos que se espera al hilo (cancelado) al cerrar la app
+
 COLUMNS=("id", "date", "opponent", "result") # Orden de columnas del Treeview
 VALID_RESULTS=("Ganada", "Perdida")
 
+# Panel de estadísticas
+STATS_TOP_OPPONENTS = 100 # Oponentes listados (los de más partidas)
+STATS_ROLLING_WINDOW = 100 # Media móvil (en partidas) de la columna del desglose mensual
+
 class ChessApp:
     """
     App de escritorio (Tkinter) para llevar un registro de partidas de Chess.com.
@@ -33,17 +60,144 @@ class ChessApp:
         self.root.minsize(680, 420)
         self._setup_style()
 
-        # Crea una sesión de SQLAlchemy (se importa de models.py)
-        self.session = Session()
+        # Totales mostrados en la cabecera (se ajustan en memoria tras cada cambio)
+        self._totals = {"Ganada": 0, "Perdida": 0}
+
+        # Filtro de la vista: el activo, sus condiciones SQL y el refresco pendiente (debounce)
+        self._filter = None
+        self._filter_where = None
+        self._filter_after = None
+
+        # Ventana de estadísticas (None si está cerrada). Se calcula en segundo plano (hilo + cola);
+        # _stats_version cambia con cada petición: solo se pinta el resultado de la última
+        self._stats_win = None
+        self._stats_version = 0
+
+        # Carga inicial en segundo plano (hilo + cola). _view_version cambia con cada recarga
+        # o cambio de la vista: si cambió mientras tanto, la carga inicial ya no se aplica tal cual
+        self._load_queue = None
+        self._view_version = 0
+
+        # Sincronización en segundo plano (hilo + cola de eventos)
+        self._sync_thread = None
+        self._sync_cancel = None
+        self._sync_queue = None
+        self._sync_username = ""
         
         # --- Layout: header / body / footer ---
         self._build_header()
         self._build_body()
         self._build_buttons()
 
-        self.refresh_table()
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
+        # Primer pintado antes de tocar la BD, con la copia local de la última vista; la BD
+        # se consulta en segundo plano y al responder solo se aplican las diferencias
+        if not RESET_ON_START:
+            self._render_snapshot()
+        self.root.update_idletasks()
+        log.info("Primer pintado en %.0f ms", (time.perf_counter() - _T0) * 1000)
+        self._start_initial_load()
+
+    def _render_snapshot(self) -> None:
+        from view_snapshot import load_snapshot
+        snap = load_snapshot()
+        if snap is None:
+            return
+        self._insert_rows(snap.rows, "end")
+        self._totals = {"Ganada": snap.totals.get("Ganada", 0), "Perdida": snap.totals.get("Perdida", 0)}
+        self._render_totals()
+        log.info("Vista inicial desde la copia local del %s (%d filas)", snap.saved_at, len(snap.rows))
+
+    def _start_initial_load(self) -> None:
+        # Sin paginar hasta tener los datos reales (la copia solo tiene la primera página)
+        self._page_pending = True
+        self._load_queue = queue.Queue(maxsize=1)
+        threading.Thread(
+            target=self._initial_load_worker, args=(self._load_queue,), name="initial-load", daemon=True
+        ).start()
+        self.root.after(SYNC_POLL_MS, self._poll_initial_load, self._view_version)
+
+    @staticmethod
+    def _initial_load_worker(events: queue.Queue) -> None:
+        """
+        Hilo de la carga inicial: conecta (y crea / migra el esquema si hace falta), vacía la
+        tabla si CHESS_RESET_ON_START=1 y lee la primera página y los totales. No toca widgets de Tk.
+        """
+        try:
+            from models import fetch_records_page, read_totals, reset_chess_records, session_scope
+            if RESET_ON_START:
+                reset_chess_records(start_at_zero=False)
+            with session_scope(commit=False) as s:
+                rows = fetch_records_page(s, limit=PAGE_SIZE)
+                totals = read_totals(s)
+            events.put(("done", (rows, totals)))
+        except Exception as e:
+            log.exception("Error en la carga inicial")
+            events.put(("error", e))
+
+    def _poll_initial_load(self, version: int) -> None:
+        try:
+            kind, payload = self._load_queue.get_nowait()
+        except queue.Empty:
+            self.root.after(SYNC_POLL_MS, self._poll_initial_load, version)
+            return
+        self._load_queue = None
+        self._page_pending = False
+        if kind == "error":
+            messagebox.showerror("DB", f"No se pudieron leer registros:\n{payload}")
+            return
+        if version != self._view_version:
+            # La vista cambió mientras tanto (filtro, edición...): se recarga entera, ya con la BD conectada
+            self.refresh_table()
+        else:
+            self._reconcile(*payload)
+        log.info("Datos cargados en %.0f ms", (time.perf_counter() - _T0) * 1000)
+
+    def _reconcile(self, rows: list[tuple], totals: dict[str, int]) -> None:
+        """
+        Lleva la vista (pintada desde la copia local) al estado real de la BD tocando solo las
+        filas que difieren: quita las que ya no están, actualiza las cambiadas e inserta las nuevas.
+        Si algo cambió, guarda la copia nueva.
+        """
+        fresh = {str(row[0]) for row in rows}
+        stale = [iid for iid in self.tree.get_children() if iid not in fresh]
+        if stale:
+            self.tree.delete(*stale)
+        changed = len(stale)
+        # Ambas listas van en orden de id: las filas que ya estaban quedan en su posición
+        for index, row in enumerate(rows):
+            iid, values = str(row[0]), self._row_values(row)
+            if not self.tree.exists(iid):
+                self.tree.insert("", index, iid=iid, values=values)
+                changed += 1
+            elif tuple(map(str, self.tree.item(iid, "values"))) != tuple(map(str, values)):
+                self.tree.item(iid, values=values)
+                changed += 1
+        self._has_before = False
+        self._has_after = len(rows) == PAGE_SIZE
+
+        totals = {"Ganada": totals.get("Ganada", 0), "Perdida": totals.get("Perdida", 0)}
+        if changed or totals != self._totals:
+            self._totals = totals
+            self._render_totals()
+            from view_snapshot import save_snapshot
+            save_snapshot(rows, totals)
+        log.info("Vista conciliada con la BD: %d filas cambiadas", changed)
+
+    def _save_snapshot(self) -> None:
+        """
+        Guarda la primera página mostrada y los totales (si la vista está sin filtro y al principio).
+        """
+        if self._filter is not None or self._has_before or self._load_queue is not None:
+            return
+        from view_snapshot import save_snapshot
+        rows = []
+        for iid in self.tree.get_children()[:PAGE_SIZE]:
+            rec_id, d, opp, res = self.tree.item(iid, "values")
+            rows.append((int(rec_id), date.fromisoformat(str(d)) if d else None, str(opp), str(res)))
+        save_snapshot(rows, self._totals)
+
     def _build_header(self) -> None:
          # Cabecera
         header = ttk.Frame(self.root, padding=PAD)
@@ -55,6 +209,44 @@ class ChessApp:
         self.totals_lbl = ttk.Label(header, text="Ganadas: 0 | Perdidas: 0", style="Header.TLabel")
         self.totals_lbl.grid(row=0, column=0, sticky="w")   
 
+        #----UI: Progreso de sincronización (oculto si no hay una en curso)----
+        self.sync_frame = ttk.Frame(header)
+        self.sync_frame.grid(row=0, column=1, sticky="e")
+        self.sync_lbl = ttk.Label(self.sync_frame, text="")
+        self.sync_lbl.grid(row=0, column=0, padx=(0,6))
+        self.sync_bar = ttk.Progressbar(self.sync_frame, mode="determinate", length=140)
+        self.sync_bar.grid(row=0, column=1, padx=(0,6))
+        ttk.Button(self.sync_frame, text="Cancelar", command=self.cancel_sync).grid(row=0, column=2)
+        self.sync_frame.grid_remove()
+
+        #----UI: Filtro (se aplica solo, FILTER_DEBOUNCE_MS después del último cambio)----
+        bar = ttk.Frame(header)
+        bar.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(6,0))
+        self.filter_opp_var = tk.StringVar()
+        self.filter_mode_var = tk.StringVar(value=next(iter(FILTER_MODES)))
+        self.filter_result_var = tk.StringVar(value=FILTER_ALL_RESULTS)
+        self.filter_from_var = tk.StringVar()
+        self.filter_to_var = tk.StringVar()
+
+        ttk.Label(bar, text="Oponente:").grid(row=0, column=0, padx=(0,4))
+        ttk.Entry(bar, textvariable=self.filter_opp_var, width=18).grid(row=0, column=1)
+        ttk.Combobox(bar, textvariable=self.filter_mode_var, values=tuple(FILTER_MODES), state="readonly",
+                     width=11).grid(row=0, column=2, padx=(4,8))
+        ttk.Combobox(bar, textvariable=self.filter_result_var, values=(FILTER_ALL_RESULTS, *VALID_RESULTS),
+                     state="readonly", width=9).grid(row=0, column=3, padx=(0,8))
+        ttk.Label(bar, text="Desde:").grid(row=0, column=4, padx=(0,4))
+        ttk.Entry(bar, textvariable=self.filter_from_var, width=11).grid(row=0, column=5)
+        ttk.Label(bar, text="Hasta:").grid(row=0, column=6, padx=(8,4))
+        ttk.Entry(bar, textvariable=self.filter_to_var, width=11).grid(row=0, column=7)
+        ttk.Button(bar, text="Limpiar", command=self.clear_filter).grid(row=0, column=8, padx=(8,0))
+        self.filter_lbl = ttk.Label(bar, text="")
+        self.filter_lbl.grid(row=0, column=9, padx=(8,0), sticky="w")
+        bar.grid_columnconfigure(9, weight=1)
+
+        for var in (self.filter_opp_var, self.filter_mode_var, self.filter_result_var,
+                    self.filter_from_var, self.filter_to_var):
+            var.trace_add("write", lambda *_: self._schedule_filter())
+
     def _build_body(self) -> None:
         #---Cuerpo: Listado---
         body = ttk.Frame(self.root, padding=(PAD, 0, PAD, PAD))
@@ -83,10 +275,16 @@ class ChessApp:
 
         self.tree.grid(row=0, column=0, sticky="nsew")
 
-        # Scrollbar
-        vscroll = ttk.Scrollbar(body, orient="vertical", command=self.tree.yview)
-        vscroll.grid(row=0, column=1, sticky="ns", padx=(5,0))
-        self.tree.configure(yscrollcommand=vscroll.set)
+        # Scrollbar (al moverse cerca de un borde se carga la página vecina)
+        self.vscroll = ttk.Scrollbar(body, orient="vertical", command=self.tree.yview)
+        self.vscroll.grid(row=0, column=1, sticky="ns", padx=(5,0))
+        self.tree.configure(yscrollcommand=self._on_tree_scroll)
+
+        # Estado de la ventana cargada (paginación por id)
+        self._has_before = False
+        self._has_after = False
+        self._page_pending = False
+        self._page_error_shown = False
 
         body.grid_rowconfigure(0, weight=1)
         body.grid_columnconfigure(0, weight=1)
@@ -96,54 +294,274 @@ class ChessApp:
         btns.grid(row=2, column=0, sticky="ew")
 
          # ----UI: Botones------
-        ttk.Button(btns, text="Agregar Ganada", command=lambda: self.open_add_dialog("Ganada")).grid(row=0, column=0, padx=(0,6))
-        ttk.Button(btns, text="Agregar Perdida", command=lambda: self.open_add_dialog("Perdida")).grid(row=0, column=1, padx=6)
-        ttk.Button(btns, text="Editar", command=self.open_edit_dialog).grid(row=0, column=2, padx=6)
-        ttk.Button(btns, text="Eliminar", command=self.delete_selected).grid(row=0, column=3, padx=6)
-        ttk.Button(btns, text="Sincronizar Chess.com", command=self.sync_from_chesscom).grid(row=0, column=4, padx=6)
-        ttk.Button(btns, text="Reset (Borrar Todo)", command=self.reset_all_records).grid(row=0, column=5, padx=(6,0))
+        add_win = ttk.Button(btns, text="Agregar Ganada", command=lambda: self.open_add_dialog("Ganada"))
+        add_win.grid(row=0, column=0, padx=(0,6))
+        add_loss = ttk.Button(btns, text="Agregar Perdida", command=lambda: self.open_add_dialog("Perdida"))
+        add_loss.grid(row=0, column=1, padx=6)
+        edit_btn = ttk.Button(btns, text="Editar", command=self.open_edit_dialog)
+        edit_btn.grid(row=0, column=2, padx=6)
+        delete_btn = ttk.Button(btns, text="Eliminar", command=self.delete_selected)
+        delete_btn.grid(row=0, column=3, padx=6)
+        self.sync_btn = ttk.Button(btns, text="Sincronizar Chess.com", command=self.sync_from_chesscom)
+        self.sync_btn.grid(row=0, column=4, padx=6)
+        ttk.Button(btns, text="Estadísticas", command=self.open_stats_panel).grid(row=0, column=5, padx=6)
+        ttk.Button(btns, text="Reset (Borrar Todo)", command=self.reset_all_records).grid(row=0, column=6, padx=(6,0))
+        # Botones que escriben en la BD: se desactivan durante una sincronización, cuya
+        # transacción abierta los haría esperar (y congelar la ventana) hasta que termine.
+        # Reset sigue activo: primero cancela la sincronización (ver reset_all_records)
+        self._write_btns = (add_win, add_loss, edit_btn, delete_btn)
          
-        btns.grid_columnconfigure(6, weight=1)
+        btns.grid_columnconfigure(7, weight=1)
         
     def refresh_table(self) -> None:
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
+        """
+        Recarga la vista desde el principio: solo la primera página, el resto
+        se va cargando al desplazarse (ver _on_tree_scroll). Con un filtro activo
+        solo se leen (y muestran) las partidas que lo cumplen.
+        """
+        with metrics.phase("refresh"):
+            self._view_version += 1
+            self.tree.delete(*self.tree.get_children())
+            self._has_before = False
+            self._has_after = False
+
+            try:
+                from models import fetch_records_page, record_filter_clauses, session_scope
+                with session_scope(commit=False) as s:
+                    # Las condiciones se recalculan en cada recarga: la elección de índices depende
+                    # de cuántas partidas hay (p.ej. tras una sincronización)
+                    self._filter_where = record_filter_clauses(s, self._filter) if self._filter else None
+                    rows = fetch_records_page(s, limit=PAGE_SIZE, where=self._filter_where)
+            except Exception as e:
+                messagebox.showerror("DB", f"No se pudieron leer registros:\n{e}")
+                return
+            self._insert_rows(rows, "end")
+            self._has_after = len(rows) == PAGE_SIZE
+            if self._filter:
+                self.filter_lbl.config(text="" if rows else "Sin coincidencias")
+
+            self.update_totals()
+
+    def _schedule_filter(self) -> None:
+        """
+        Programa la aplicación del filtro (debounce): cada cambio cancela la consulta
+        pendiente del anterior, así que al escribir solo se consulta por el texto final.
+        """
+        if self._filter_after is not None:
+            self.root.after_cancel(self._filter_after)
+        self._filter_after = self.root.after(FILTER_DEBOUNCE_MS, self._apply_filter)
+
+    def _read_filter(self):
+        """
+        RecordFilter con lo escrito en la barra de filtro. ValueError si una fecha no es válida.
+        """
+        from models import RecordFilter
+        dates = []
+        for var in (self.filter_from_var, self.filter_to_var):
+            d = var.get().strip()
+            if d and not re.fullmatch(r"\d{4}-\d{2}-\d{2}", d):
+                raise ValueError(d)
+            dates.append(date.fromisoformat(d) if d else None)
+        result = self.filter_result_var.get()
+        return RecordFilter(
+            opponent=self.filter_opp_var.get().strip(),
+            contains=FILTER_MODES.get(self.filter_mode_var.get(), False),
+            result=result if result in VALID_RESULTS else None,
+            date_from=dates[0],
+            date_to=dates[1],
+        )
+
+    def _apply_filter(self) -> None:
+        self._filter_after = None
         try:
-            records=self.session.query(ChessRecord).order_by(ChessRecord.id).all()
-            for rec in records:
-                self.tree.insert("", "end", iid=str(rec.id), values=(rec.id, rec.date or "", rec.opponent or "", rec.result))
-        except Exception as e:
-            messagebox.showerror("DB", f"No se pudieron leer registros:\n{e}")
+            flt = self._read_filter()
+        except ValueError:
+            # Fecha a medio escribir: se mantiene el filtro anterior hasta que sea válida
+            self.filter_lbl.config(text="Fecha inválida (YYYY-MM-DD)")
             return
-    
-        self.update_totals()
+        self.filter_lbl.config(text="")
+        flt = flt or None
+        if flt == self._filter:
+            return
+        self._filter = flt
+        self.refresh_table()
+
+    def clear_filter(self) -> None:
+        for var in (self.filter_opp_var, self.filter_from_var, self.filter_to_var):
+            var.set("")
+        self.filter_result_var.set(FILTER_ALL_RESULTS)
+
+    @staticmethod
+    def _row_values(row: tuple) -> tuple:
+        rec_id, d, opp, res = row
+        return rec_id, d.isoformat() if d else "", opp or "", res
+
+    def _insert_rows(self, rows: list[tuple], index) -> None:
+        for row in rows:
+            self.tree.insert("", index, iid=str(row[0]), values=self._row_values(row))
+
+    def _on_tree_scroll(self, first: str, last: str) -> None:
+        """
+        yscrollcommand del Treeview: actualiza la scrollbar y, si la vista se acerca
+        a un borde de la ventana cargada, programa la carga de la página vecina.
+        """
+        self.vscroll.set(first, last)
+        if self._page_pending:
+            return
+        if self._has_after and float(last) >= 1.0 - PREFETCH_MARGIN:
+            self._page_pending = True
+            self.root.after_idle(self._load_next_page)
+        elif self._has_before and float(first) <= PREFETCH_MARGIN:
+            self._page_pending = True
+            self.root.after_idle(self._load_prev_page)
+
+    def _load_next_page(self) -> None:
+        from models import fetch_records_page, session_scope
+        try:
+            items = self.tree.get_children()
+            if not items:
+                return
+            with session_scope(commit=False) as s:
+                rows = fetch_records_page(s, after_id=int(items[-1]), limit=PAGE_SIZE, where=self._filter_where)
+            self._has_after = len(rows) == PAGE_SIZE
+            self._page_error_shown = False
+            if not rows:
+                return
+            top = self.tree.yview()[0] * len(items) # primera fila visible
+            self._insert_rows(rows, "end")
+            # Descarta filas del principio para mantener la ventana acotada
+            items = self.tree.get_children()
+            extra = len(items) - MAX_LOADED_ROWS
+            if extra > 0:
+                self.tree.delete(*items[:extra])
+                self._has_before = True
+                self.tree.yview_moveto(max(top - extra, 0) / MAX_LOADED_ROWS)
+        except Exception as e:
+            self._page_load_failed(e)
+        finally:
+            self._page_pending = False
+
+    def _load_prev_page(self) -> None:
+        from models import fetch_records_page, session_scope
+        try:
+            items = self.tree.get_children()
+            if not items:
+                return
+            with session_scope(commit=False) as s:
+                rows = fetch_records_page(s, before_id=int(items[0]), limit=PAGE_SIZE, where=self._filter_where)
+            self._has_before = len(rows) == PAGE_SIZE
+            self._page_error_shown = False
+            if not rows:
+                return
+            top = self.tree.yview()[0] * len(items) + len(rows)
+            self._insert_rows(reversed(rows), 0)
+            # Descarta filas del final para mantener la ventana acotada
+            items = self.tree.get_children()
+            extra = len(items) - MAX_LOADED_ROWS
+            if extra > 0:
+                self.tree.delete(*items[-extra:])
+                self._has_after = True
+            self.tree.yview_moveto(top / len(self.tree.get_children()))
+        except Exception as e:
+            self._page_load_failed(e)
+        finally:
+            self._page_pending = False
+
+    def _page_load_failed(self, error: Exception) -> None:
+        """
+        Error al leer una página vecina: se registra y se avisa una sola vez (cada
+        desplazamiento lo reintenta; el aviso vuelve a mostrarse tras una carga correcta).
+        """
+        log.exception("Error al cargar una página")
+        if not self._page_error_shown:
+            self._page_error_shown = True
+            messagebox.showerror("DB", f"No se pudieron cargar más registros:\n{error}\n\n"
+                                       "Se reintentará al desplazarse de nuevo.")
 
     def update_totals(self):
         """
         Actualiza los totales de ganadas/perdidas
         """
         try:
-            g = self.session.query(ChessRecord).filter(ChessRecord.result == "Ganada").count()
-            p = self.session.query(ChessRecord).filter(ChessRecord.result == "Perdida").count()  
-            self.totals_lbl.config(text=f"Ganadas: {g} | Perdidas: {p}")
+            # Lee el resumen precalculado (record_stats): no recorre la tabla de partidas
+            from models import read_totals, session_scope
+            with session_scope(commit=False) as s:
+                totals = read_totals(s)
+            self._totals = {"Ganada": totals.get("Ganada", 0), "Perdida": totals.get("Perdida", 0)}
+            self._render_totals()
         except Exception:
              # Si hay error de conexión, no rompas la UI
              pass
+
+    def _render_totals(self) -> None:
+        self.totals_lbl.config(text=f"Ganadas: {self._totals['Ganada']} | Perdidas: {self._totals['Perdida']}")
+
+    def _apply_change(self, kind: str, row: tuple, old_result: str | None = None) -> None:
+        """
+        Aplica a la vista un único cambio ya guardado en la BD, sin recargar la tabla:
+        - kind="insert" -> agrega la fila (si el final de la tabla está cargado)
+        - kind="update" -> actualiza la fila si está visible ('old_result' = resultado previo)
+        - kind="delete" -> quita la fila
+        'row' es la tupla (id, date, opponent, result). Los totales se ajustan en memoria.
+        Con un filtro activo, las filas que no lo cumplen no se muestran (o se quitan).
+        """
+        rec_id, d, opp, res = row
+        iid = str(rec_id)
+        values = self._row_values(row)
+        self._view_version += 1
+        visible = self._filter is None or self._filter.matches(opp, res, d)
+        if kind == "insert":
+            # Si la ventana no llega al final, la fila se verá al paginar hasta ahí
+            if visible and not self._has_after:
+                self.tree.insert("", "end", iid=iid, values=values)
+                items = self.tree.get_children()
+                if len(items) > MAX_LOADED_ROWS:
+                    self.tree.delete(items[0])
+                    self._has_before = True
+                self.tree.see(iid)
+            self._totals[res] = self._totals.get(res, 0) + 1
+        elif kind == "update":
+            if self.tree.exists(iid):
+                if visible:
+                    self.tree.item(iid, values=values)
+                else:
+                    self.tree.delete(iid)
+            self._totals[old_result] = self._totals.get(old_result, 0) - 1
+            self._totals[res] = self._totals.get(res, 0) + 1
+        elif kind == "delete":
+            if self.tree.exists(iid):
+                self.tree.delete(iid)
+            self._totals[res] = self._totals.get(res, 0) - 1
+        self._render_totals()
     
+    def _sync_blocks_writes(self, title: str) -> bool:
+        """
+        True (y avisa) si hay una sincronización en curso: escribir desde la ventana
+        esperaría a que termine su transacción.
+        """
+        if self._sync_thread is None:
+            return False
+        messagebox.showwarning(title, "Espera a que termine (o cancela) la sincronización en curso.")
+        return True
+
     def open_add_dialog(self, default_result: str | None = None) -> None:
+        if self._sync_blocks_writes("Agregar"):
+            return
         self._open_record_dialog(title="Agregar registro", default_result=default_result)
 
     def open_edit_dialog(self) -> None:
-        rec=self._get_selected_record()    
+        if self._sync_blocks_writes("Editar"):
+            return
+        rec=self._get_selected_row()    
         if not rec:
             messagebox.showwarning("Editar", "Seleccione un registro.")
             return
         self._open_record_dialog(title="Editar registro", record=rec)
 
-    def _open_record_dialog(self, title: str, record: ChessRecord | None = None, default_result: str | None = None) -> None:
+    def _open_record_dialog(self, title: str, record: tuple | None = None, default_result: str | None = None) -> None:
         """
-        Crea un diálogo simple (Toplevel) para agregar/editar
+        Crea un diálogo simple (Toplevel) para agregar/editar.
+        'record' es la tupla (id, date, opponent, result) del registro a editar.
         """
         dlg = tk.Toplevel(self.root)
         dlg.title(title)
@@ -157,18 +575,19 @@ class ChessApp:
 
         ttk.Label(frm, text="Resultado:").grid(row=0, column=0, sticky="w")
 
-        result_var = tk.StringVar(value=(record.result if record else (default_result or "Ganada")))
+        rec_id, rec_date, rec_opp, rec_result = record or (None, None, None, None)
+        result_var = tk.StringVar(value=(rec_result if record else (default_result or "Ganada")))
         result_cb = ttk.Combobox(frm, textvariable=result_var, values=VALID_RESULTS, state="readonly", width = 14)
         result_cb.grid(row=0, column=1, sticky="w", pady=3)
 
         ttk.Label(frm, text="Oponente:").grid(row=1, column=0, sticky="w")
 
-        opp_var = tk.StringVar(value=(record.opponent if record else ""))
+        opp_var = tk.StringVar(value=(rec_opp or ""))
         opp_entry = ttk.Entry(frm, textvariable=opp_var, width=28)
         opp_entry.grid(row=1, column=1, sticky="w", pady=3)
 
         ttk.Label(frm, text="Fecha (YYYY=MM-DD):").grid(row=2, column=0, sticky="w")
-        date_var = tk.StringVar(value=(record.date if record and record.date else date.today().isoformat()))
+        date_var = tk.StringVar(value=(rec_date if record and rec_date else date.today()).isoformat())
         date_entry = ttk.Entry(frm, textvariable=date_var, width=16)
         date_entry.grid(row=2, column=1, sticky="w", pady=3)
 
@@ -182,24 +601,39 @@ class ChessApp:
                 return
             
             d = date_var.get().strip()
-            if d and not re.fullmatch(r"\d{4}-\d{2}-\d{2}", d):
+            try:
+                if d and not re.fullmatch(r"\d{4}-\d{2}-\d{2}", d):
+                    raise ValueError(d)
+                d = date.fromisoformat(d) if d else None
+            except ValueError:
                 messagebox.showerror("Validación", "Fecha inválida. Usa formato YYYY-MM-DD.", parent=dlg)
                 return
             
             opp = opp_var.get().strip() or None
 
             try:
-                if record:
-                    record.result = res
-                    record.opponent = opp
-                    record.date = d or None
-                else:
-                    self.session.add(ChessRecord(result=res, opponent=opp, date=d or None))
-                self.session.commit()
-                self.refresh_table()
+                from models import ChessRecord, session_scope
+                with session_scope() as s:
+                    if record:
+                        rec = s.get(ChessRecord, rec_id)
+                        if rec is None:
+                            raise LookupError(f"El registro #{rec_id} ya no existe.")
+                        old_result = rec.result
+                        rec.result = res
+                        rec.opponent = opp
+                        rec.date = d
+                        kind = "update"
+                    else:
+                        old_result = None
+                        rec = ChessRecord(result=res, opponent=opp, date=d)
+                        s.add(rec)
+                        s.flush() # asigna el id
+                        kind = "insert"
+                    row = (rec.id, d, opp, res)
+                # Solo se actualiza la fila afectada (no se recarga la tabla)
+                self._apply_change(kind, row, old_result)
                 dlg.destroy()
             except Exception as e:
-                self.session.rollback()
                 messagebox.showerror("DB", f"No se pudo guardar:\n{e}", parent=dlg)
 
         def on_cancel():
@@ -212,30 +646,39 @@ class ChessApp:
         (opp_entry if not record else result_cb).focus_set()
         self.root.wait_window(dlg)
 
-    def _get_selected_record(self) -> ChessRecord | None:
+    def _get_selected_row(self) -> tuple | None:
+        """
+        Tupla (id, date, opponent, result) del registro seleccionado, leída de la BD.
+        """
         sel = self.tree.selection()
         if not sel:
             return None
         rec_id = int(sel[0])
         try:
-            rec = self.session.get(ChessRecord, rec_id)
-            return rec
+            from models import fetch_record_row, session_scope
+            with session_scope(commit=False) as s:
+                return fetch_record_row(s, rec_id)
         except Exception:
             return None
 
     def delete_selected(self) -> None:
-        rec = self._get_selected_record()
-        if not rec:
+        if self._sync_blocks_writes("Eliminar"):
+            return
+        row = self._get_selected_row()
+        if not row:
             messagebox.showwarning("Eliminar", "Selecciona un registro")
             return
-        if not messagebox.askyesno("Confirmar", f"¿Eliminar registro #{rec.id}?", default="no"):
+        if not messagebox.askyesno("Confirmar", f"¿Eliminar registro #{row[0]}?", default="no"):
             return
         try:
-            self.session.delete(rec)
-            self.session.commit()
-            self.refresh_table()
+            from models import ChessRecord, session_scope
+            with session_scope() as s:
+                # Por el ORM: su before_flush mantiene al día el resumen record_stats
+                rec = s.get(ChessRecord, row[0])
+                if rec is not None:
+                    s.delete(rec)
+            self._apply_change("delete", row)
         except Exception as e:
-            self.session.rollback()
             messagebox.showerror("DB", f"No se pudo eliminar:\n{e}")
 
     def reset_all_records(self):
@@ -245,33 +688,52 @@ class ChessApp:
         """
         if not messagebox.askyesno(
             "Confirmar",
-            "Esto borrará TODOS los registros (ganadas/perdidas) de la base de datos y reiniciará los IDs. ¿Continuar?"
+            "Esto borrará TODOS los registros (ganadas/perdidas) de la base de datos y reiniciará los IDs."
+            + ("\nSe cancelará la sincronización en curso." if self._sync_thread is not None else "")
+            + " ¿Continuar?"
         ):
             return
+        # TRUNCATE / DELETE esperarían a la transacción de la sincronización: se cancela antes
+        if not self._stop_sync():
+            messagebox.showerror("Error", "La sincronización en curso no terminó; vuelve a intentarlo.")
+            return
         try: 
-            self.session.execute(text("TRUNCATE TABLE chess_records RESTART IDENTITY"))
-            self.session.commit()
-
-            # Invalida el identity map / caché del ORM para no ver filas "fantasma"
-            self.session.expire_all()
-            # Refrescar
+            from models import clear_all_records, session_scope
+            with session_scope() as s:
+                clear_all_records(s)
+            # Refrescar (cada operación usa una sesión nueva: no quedan filas "fantasma" en caché)
             self.refresh_table()
 
             messagebox.showinfo("Listo", "Se borraron todos los registros y se reiniciaron los IDs.")
         except Exception as e:
-            self.session.rollback()
             messagebox.showerror("Error", f"No se pudo borrar los registros: {e}")
 
     
     def on_close(self):
         """
-        Cierre limpio: cierra la sesión de la base de datos de SQLAlchemy y destruye la ventana
+        Cierre limpio: guarda la copia de la vista, cancela la sincronización en curso y destruye la ventana
+        (la app no mantiene sesiones de BD abiertas entre operaciones)
         """
         try:
-            self.session.close()
+            # Copia de la vista para el próximo arranque
+            self._save_snapshot()
+            # Si hay una sincronización en curso, se cancela (rollback) antes de salir
+            self._stop_sync()
         finally:
             self.root.destroy()
 
+    def _stop_sync(self) -> bool:
+        """
+        Cancela la sincronización en curso (si hay) y espera a su hilo hasta SYNC_JOIN_TIMEOUT.
+        True si ya no queda ninguna corriendo. Su evento final lo procesa _poll_sync como siempre.
+        """
+        thread = self._sync_thread
+        if thread is None:
+            return True
+        self.cancel_sync()
+        thread.join(timeout=SYNC_JOIN_TIMEOUT)
+        return not thread.is_alive()
+
     def _setup_style(self) -> None:
         """
         Configura estilos base para ttk y fuente por defecto.
@@ -317,144 +779,350 @@ class ChessApp:
     
 
 
+    # Estadísticas
+    def open_stats_panel(self) -> None:
+        """
+        Ventana (no modal) con rachas, media móvil, desglose mensual y cara a cara por oponente.
+        Los datos vienen de analytics.py (memorizados: reabrirla o actualizarla sin cambios es instantáneo).
+        """
+        if self._stats_win is not None:
+            self._stats_win.lift()
+            self._render_stats()
+            return
+
+        win = tk.Toplevel(self.root)
+        win.title("Estadísticas")
+        win.transient(self.root)
+        win.minsize(560, 420)
+        win.grid_rowconfigure(1, weight=1)
+        win.grid_columnconfigure(0, weight=1)
+        self._stats_win = win
+
+        def on_close():
+            self._stats_win = None
+            win.destroy()
+        win.protocol("WM_DELETE_WINDOW", on_close)
+
+        top = ttk.Frame(win, padding=PAD)
+        top.grid(row=0, column=0, sticky="ew")
+        top.grid_columnconfigure(0, weight=1)
+        self.stats_lbl = ttk.Label(top, text="", justify="left", style="Header.TLabel")
+        self.stats_lbl.grid(row=0, column=0, sticky="w")
+        ttk.Button(top, text="Actualizar", command=lambda: self._render_stats(force=True)).grid(row=0, column=1, sticky="ne")
+
+        notebook = ttk.Notebook(win, padding=(PAD, 0, PAD, PAD))
+        notebook.grid(row=1, column=0, sticky="nsew")
+
+        def table(columns: tuple[tuple[str, str, int], ...]) -> tuple[ttk.Frame, ttk.Treeview]:
+            frame = ttk.Frame(notebook)
+            frame.grid_rowconfigure(0, weight=1)
+            frame.grid_columnconfigure(0, weight=1)
+            tree = ttk.Treeview(frame, columns=[c for c, _, _ in columns], show="headings", height=LISTBOX_HEIGHT)
+            for col, text, width in columns:
+                tree.heading(col, text=text)
+                tree.column(col, width=width, anchor="w" if col == "opponent" else "center")
+            tree.grid(row=0, column=0, sticky="nsew")
+            scroll = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+            scroll.grid(row=0, column=1, sticky="ns")
+            tree.configure(yscrollcommand=scroll.set)
+            return frame, tree
+
+        frame, self.stats_months = table((
+            ("month", "Mes", 90), ("wins", "Ganadas", 80), ("losses", "Perdidas", 80),
+            ("rate", "% victorias", 90), ("rolling", f"Media últimas {STATS_ROLLING_WINDOW}", 150),
+        ))
+        notebook.add(frame, text="Por mes")
+
+        frame, self.stats_opponents = table((
+            ("opponent", "Oponente", 200), ("wins", "Ganadas", 80), ("losses", "Perdidas", 80), ("rate", "% victorias", 90),
+        ))
+        self.stats_h2h_lbl = ttk.Label(frame, text="Selecciona un oponente para ver el cara a cara.")
+        self.stats_h2h_lbl.grid(row=1, column=0, columnspan=2, sticky="w", pady=(6, 0))
+        self.stats_opponents.bind("<<TreeviewSelect>>", lambda _e: self._render_head_to_head())
+        notebook.add(frame, text="Por oponente")
+
+        self._render_stats()
+
+    def _render_stats(self, force: bool = False) -> None:
+        """
+        Recalcula el panel en un hilo aparte y lo pinta al terminar: tras un commit las consultas
+        de ventana (media móvil, rachas) se recalculan en frío, y eso no debe congelar la ventana.
+        force=True descarta lo memorizado (p.ej. si otro proceso, como chess_cli.py, escribió
+        en la BD: esos cambios no invalidan esta caché).
+        """
+        self._stats_version += 1
+        self.stats_lbl.config(text="Calculando estadísticas…")
+        events = queue.Queue(maxsize=1)
+        threading.Thread(
+            target=self._stats_worker, args=(force, events), name="stats", daemon=True
+        ).start()
+        self.root.after(SYNC_POLL_MS, self._poll_stats, events, self._stats_version)
+
+    @staticmethod
+    def _stats_worker(force: bool, events: queue.Queue) -> None:
+        """
+        Hilo del panel de estadísticas: consulta analytics (su caché es segura entre hilos)
+        con una sesión propia. No toca widgets de Tk.
+        """
+        try:
+            import analytics
+            from models import session_scope
+            if force:
+                analytics.cache.clear()
+            with metrics.phase("stats"), session_scope(commit=False) as session:
+                data = (
+                    analytics.summary(session),
+                    analytics.monthly_breakdown(session),
+                    analytics.rolling_win_rate_by_month(session, STATS_ROLLING_WINDOW),
+                    analytics.top_opponents(session, STATS_TOP_OPPONENTS),
+                )
+            events.put(("done", data))
+        except Exception as e:
+            log.exception("Error al calcular las estadísticas")
+            events.put(("error", e))
+
+    def _poll_stats(self, events: queue.Queue, version: int) -> None:
+        if self._stats_win is None or version != self._stats_version:
+            return # panel cerrado o ya hay una petición más nueva
+        try:
+            kind, payload = events.get_nowait()
+        except queue.Empty:
+            self.root.after(SYNC_POLL_MS, self._poll_stats, events, version)
+            return
+        if kind == "error":
+            self.stats_lbl.config(text="")
+            messagebox.showerror("DB", f"No se pudieron calcular las estadísticas:\n{payload}", parent=self._stats_win)
+            return
+        self._show_stats(*payload)
+
+    def _show_stats(self, s: dict, months: list, rolling: dict, opponents: list) -> None:
+        """
+        Pinta en el panel lo calculado por _stats_worker.
+        """
+        def pct(rate: float | None) -> str:
+            return "-" if rate is None else f"{rate:.1%}"
+
+        def streak(st) -> str:
+            if st is None:
+                return "-"
+            span = f"{st.start.isoformat()} → {st.end.isoformat()}" if st.start and st.end else "sin fecha"
+            return f"{st.length} ({span})"
+
+        current = s["current"]
+        lines = [
+            f"Ganadas: {s['wins']} | Perdidas: {s['losses']} | Victorias: {pct(s['win_rate'])}",
+            " | ".join(f"Últimas {n}: {pct(rate)}" for n, rate in s["rolling"].items()),
+            f"Racha actual: {current.length} {current.result}s" if current else "Racha actual: -",
+            f"Racha más larga de victorias: {streak(s['longest'].get('Ganada'))}",
+            f"Racha más larga de derrotas: {streak(s['longest'].get('Perdida'))}",
+        ]
+        self.stats_lbl.config(text="\n".join(lines))
+
+        self.stats_months.delete(*self.stats_months.get_children())
+        for month, wins, losses in reversed(months): # el más reciente arriba
+            self.stats_months.insert("", "end", values=(
+                month, wins, losses, pct(wins / (wins + losses) if wins + losses else None), pct(rolling.get(month))
+            ))
+
+        selected = self.stats_opponents.selection()
+        self.stats_opponents.delete(*self.stats_opponents.get_children())
+        for opp, wins, losses in opponents:
+            self.stats_opponents.insert("", "end", iid=opp, values=(
+                opp, wins, losses, pct(wins / (wins + losses) if wins + losses else None)
+            ))
+        if selected and self.stats_opponents.exists(selected[0]):
+            self.stats_opponents.selection_set(selected[0])
+
+    def _render_head_to_head(self) -> None:
+        sel = self.stats_opponents.selection()
+        if not sel:
+            return
+        try:
+            import analytics
+            from models import session_scope
+            with session_scope(commit=False) as s:
+                h = analytics.head_to_head(s, sel[0])
+        except Exception as e:
+            self.stats_h2h_lbl.config(text=f"Error: {e}")
+            return
+        span = f"{h['first'].isoformat()} → {h['last'].isoformat()}" if h["first"] else "sin fecha"
+        rate = "-" if h["win_rate"] is None else f"{h['win_rate']:.1%}"
+        self.stats_h2h_lbl.config(
+            text=f"{h['opponent']}: {h['wins']}G / {h['losses']}P ({rate}) | {span} | Últimas: {h['recent'] or '-'}"
+        )
+
     # Sincronización con Chess.com
     def sync_from_chesscom(self):
         """
         Pide el username, consulta la API pública de Chess.com y agrega a la BD
-        todas las partidas 'Ganada' o 'Perdida' de los últimos N meses.
-        (Empates se ignoran por ahora; puedes activarlos en OnlineChessAPI.py)
+        todas las partidas 'Ganada' o 'Perdida' de los últimos N meses
+        (o de todo el historial, descargando los meses en paralelo).
+        La descarga y la escritura corren en un hilo aparte: la ventana sigue respondiendo,
+        muestra el progreso y permite cancelar (se deshace todo lo de esa sincronización).
+        (Los empates se cuentan en el resumen pero no se guardan)
         """
+        if self._sync_thread is not None:
+            return # Ya hay una sincronización en curso
+
         username = simpledialog.askstring("Chess.com", "Tu username de Chess.com (exacto):") 
         if not username:
             return  # Cancelado
-        
-        # Importante: agrega un User-Agent con contacto en caso de que Chess.com bloquee la solicitud
-        headers = {
-            "User-Agent": USER_AGENT
-        }
 
+        full_history = messagebox.askyesno(
+            "Chess.com",
+            f"¿Descargar TODO el historial de '{username}'?\n"
+            f"(No = solo los últimos {MONTHS_TO_FETCH} mes(es))",
+            default="no"
+        )
 
-        try: 
-            # 1) Obtener Lista de archivos mensuales
-            url_archives = f"https://api.chess.com/pub/player/{username}/games/archives"
-            r = requests.get(url_archives, headers=headers, timeout=20)
+        self._sync_username = username
+        self._sync_cancel = threading.Event()
+        self._sync_queue = queue.Queue()
+        self._sync_thread = threading.Thread(
+            target=self._sync_worker,
+            args=(username, None if full_history else MONTHS_TO_FETCH, self._sync_cancel, self._sync_queue),
+            name="chesscom-sync",
+            daemon=True,
+        )
+        self._show_sync_ui()
+        self._sync_thread.start()
+        self.root.after(SYNC_POLL_MS, self._poll_sync)
 
-            # Errores típicos
-            if r.status_code == 403:
-                messagebox.showerror("API 403", "Chess.com rechazó la solicitud. Agrega un User-Agent con contacto.")
-                return
-            if r.status_code == 404:
-                messagebox.showerror("Usuario no encontrado", f"No se encontró el usuario '{username}' en Chess.com.")
-                return
-            r.raise_for_status()
-            archives = r.json().get("archives", [])
-            print("Num archives:" , len(archives))
-            if not archives:
-                messagebox.showinfo("Sin datos", f"No hay archivos de partidas para '{username}'.")
-                return
-        
-           
-            month_urls = archives[-MONTHS_TO_FETCH:]
-            print("Procesando meses:", month_urls)
-
-            # Contadores para feedback
-            inserted = 0
-            scanned = 0
-            wins = 0
-            losses = 0
-            draws = 0 
-
-            # Recorre cada mes y sus partidas
-            for month_url in month_urls:
-                print("GET month:", month_url)
-                m = requests.get(month_url, headers=headers, timeout=30)
-                print("Status month:", m.status_code)
-                if m.status_code == 403:
-                    messagebox.showerror("API 403", "Chess.com rechazó una descarga mensual. Revisa el User-Agent/ratio.")
-                    return 
-                m.raise_for_status()
-                games = m.json().get("games", [])
-                print(f"Partidas en {month_url}:", len(games))
-
-                for g in games:
-                    scanned += 1 # Cuenta las partidas escaneadas
-                    
-                    # Mapear resultado para 'username' -> "Ganada"/"Perdida"/None
-                    outcome = map_result_for_player(g, username)
-                    if outcome is None:
-                        continue # Ignoramos empates/otros estados
-
-                    # Contadores de wins/losses detectadas (no insertadas)
-                    if outcome == "Ganada":
-                        wins += 1
-                    elif outcome == "Perdida":
-                        losses += 1
-                    
-                    # Fecha: usaremos end_time (epoch) si existe
-                    end_ts = g.get("end_time")
-                    date_str = datetime.fromtimestamp(end_ts, tz=timezone.utc).strftime("%Y-%m-%d") if end_ts else ""
-                
-                    # Oponente (Lo determinamos dentro del helper; repetimos aquí por simplicidad)
-                    white = g.get("white", {})
-                    black = g.get("black", {})
-                    if white.get("username", "").lower() == username.lower():
-                        opponent = black.get("username")
-                    else:
-                        opponent = white.get("username")
-
-                    # Evitar duplicados básicos: (opponent, result, date)
-                    exists = (
-                        self.session.query(ChessRecord)
-                        .filter(
-                            ChessRecord.opponent == opponent,
-                            ChessRecord.result == outcome,
-                            ChessRecord.date == date_str  
-                        )
-                        .first()
+    @staticmethod
+    def _sync_worker(username: str, months: int | None, cancel: threading.Event, events: queue.Queue) -> None:
+        """
+        Hilo de sincronización: usa su propia sesión de BD (una sola transacción, de la
+        que solo se cargan objetos pequeños: las inserciones van por Core) y comunica
+        progreso/resultado por la cola 'events'. No toca widgets de Tk.
+        Todos los eventos finales llevan (resultado, Metrics) con los tiempos por fase.
+        """
+        # Importaciones diferidas: solo se cargan si se sincroniza
+        import requests
+        from chess_sync import SyncCancelled, sync_player
+        from game_store import default_store
+        from models import session_scope
+        from OnlineChessAPI import ChessComClient, ChessComError
+
+        with metrics.collect(f"sync {username}") as m:
+            try:
+                # Persiste al terminar (una sola transacción por sincronización); si falla, rollback
+                with session_scope() as session, ChessComClient() as client:
+                    stats = sync_player(
+                        session, client, username, months,
+                        progress=lambda st: events.put(("progress", st)),
+                        cancel=cancel, store=default_store(),
                     )
-                    if not exists:
-                        self.session.add(ChessRecord(opponent=opponent, result=outcome, date=date_str))
-                        inserted +=1
-            
-            # Persistir cambios y refrescar UI
-            self.session.commit()
+                event = ("done", stats)
+            except Exception as e:
+                if isinstance(e, SyncCancelled):
+                    event = ("cancelled", None)
+                elif isinstance(e, ChessComError):
+                    # Errores típicos de la API (403 / 404)
+                    title = "Usuario no encontrado" if e.status_code == 404 else f"API {e.status_code}"
+                    event = ("error", (title, str(e)))
+                elif isinstance(e, requests.RequestException):
+                    # Errores de red (timeout, DNS, etc.)
+                    log.warning("Error de red: %s", e)
+                    event = ("error", ("Red", f"Error de red al consultar Chess.com: {e}"))
+                else:
+                    # Otros errores: se deshizo la transacción; informar
+                    log.exception("Error al sincronizar")
+                    event = ("error", ("Error", f"Ocurrió un error al sincronizar: {e}"))
+        events.put((event[0], (event[1], m)))
+
+    def _poll_sync(self) -> None:
+        """
+        Lee (sin bloquear) los eventos del hilo de sincronización y actualiza la UI.
+        Se reprograma con root.after mientras la sincronización siga en curso.
+        """
+        last_progress = None
+        while True:
+            try:
+                kind, payload = self._sync_queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                last_progress = payload
+                continue
+            self._hide_sync_ui()
+            self._finish_sync(kind, payload)
+            return
+        if last_progress is not None:
+            self._show_sync_progress(last_progress)
+        self.root.after(SYNC_POLL_MS, self._poll_sync)
+
+    def _finish_sync(self, kind: str, payload) -> None:
+        username = self._sync_username
+        self._sync_thread = None
+        payload, sync_metrics = payload
+        if kind != "done":
+            log.info("Sincronización de '%s' (%s):\n%s", username, kind, "\n".join(sync_metrics.summary_lines()))
+        if kind == "cancelled":
+            messagebox.showinfo("Sincronización cancelada", "Se canceló la sincronización; no se guardó ningún cambio.")
+            return
+        if kind == "error":
+            title, message = payload
+            messagebox.showerror(title, message)
+            return
+
+        stats = payload
+        if stats.archives == 0:
+            messagebox.showinfo("Sin datos", f"No hay archivos de partidas para '{username}'.")
+            return
+
+        # Refrescar UI (recarga completa tras sincronizar); cuenta como fase de la sincronización
+        with metrics.collect(metrics=sync_metrics):
             self.refresh_table()
-            messagebox.showinfo("Sincronización Completa", f"Se insertaron {inserted} partidas (Ganada/Perdida).")
-
-            # Resumen visible: (tanto en messagebox como en consola)
-            msg = [
-                f"Escaneadas: {scanned}",
-                f"Wins detectadas: {wins}",
-                f"Losses detectadas: {losses}",
-                f"Empates detectados: {draws}",
-                f"Nuevos insertados: {inserted}"
-            ]
-            messagebox.showinfo("Sincronización Chess.com", "\n".join(msg))
-            print("\n".join(msg))
-
-            # Mensaje adicional si no insertó nada
-            if inserted == 0:
-                messagebox.showinfo(
-                    "Sin partidas nuevas",
-                    "No se insertaron partidas nuevas.\n"
-                    "- Puede que todas fueran empates (actualmente ignorados),\n"
-                    "- o que ya estuvieran registradas (deduplicación),\n"
-                    "- o que no haya partidas en los últimos meses procesados."
-                )
+        if self._stats_win is not None:
+            self._render_stats() # en segundo plano
+        messagebox.showinfo("Sincronización Completa", f"Se insertaron {stats.inserted} partidas (Ganada/Perdida).")
 
-        except requests.RequestException as e:
-            # Errores de red (timeout, DNS, etc.)
-            messagebox.showerror("Red", f"Error de red al consultar Chess.com: {e}")        
-            print("Network error:", e)
-        except Exception as e:
-            # Otros errores: deshacer transacción e informar
-            self.session.rollback()
-            messagebox.showerror("Error", f"Ocurrió un error al sincronizar: {e}")
-            print("Sync error:", e)
+        # Resumen visible: contadores y tiempos por fase (también en el log)
+        msg = stats.summary_lines() + [""] + sync_metrics.summary_lines()
+        log.info("Sincronización de '%s':\n%s", username, "\n".join(msg))
+        messagebox.showinfo("Sincronización Chess.com", "\n".join(msg))
+
+        # Mensaje adicional si no insertó nada
+        if stats.inserted == 0:
+            messagebox.showinfo(
+                "Sin partidas nuevas",
+                "No se insertaron partidas nuevas.\n"
+                "- Puede que todas fueran empates (actualmente ignorados),\n"
+                "- o que ya estuvieran registradas (deduplicación),\n"
+                "- o que no haya partidas en los últimos meses procesados."
+            )
+
+    def cancel_sync(self) -> None:
+        if self._sync_cancel is not None:
+            self._sync_cancel.set()
+            self.sync_lbl.config(text="Cancelando…")
+
+    def _show_sync_ui(self) -> None:
+        self.sync_btn.state(["disabled"])
+        for btn in self._write_btns:
+            btn.state(["disabled"])
+        self.sync_lbl.config(text=f"Sincronizando '{self._sync_username}'…")
+        self.sync_bar.config(value=0, maximum=1)
+        self.sync_frame.grid()
+
+    def _show_sync_progress(self, stats) -> None:
+        if self._sync_cancel.is_set():
+            return
+        self.sync_bar.config(maximum=max(stats.months_total, 1), value=stats.months)
+        self.sync_lbl.config(
+            text=f"Meses {stats.months}/{stats.months_total} | Escaneadas {stats.scanned} | Nuevas {stats.inserted}"
+        )
+
+    def _hide_sync_ui(self) -> None:
+        self.sync_frame.grid_remove()
+        self.sync_btn.state(["!disabled"])
+        for btn in self._write_btns:
+            btn.state(["!disabled"])
 
 # Punto de entrada: crea la raíz de Tkinter (Tk) y arranca la app
 if __name__ == "__main__":
-    reset_chess_records(start_at_zero=False) 
+    metrics.configure_logging()
+    # Vaciar la tabla al arrancar (opcional, CHESS_RESET_ON_START=1) se hace en la carga en segundo plano
     root = tk.Tk()
     app = ChessApp(root)
     root.mainloop()
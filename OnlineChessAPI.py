@@ -1,37 +1,369 @@
+import json
+import logging
 import requests
-from datetime import datetime
+import tempfile
+import threading
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import BinaryIO
+from requests.adapters import HTTPAdapter
+
+from config import (
+    CHESSCOM_API_BASE, HTTP_BACKOFF_BASE, HTTP_BACKOFF_MAX, HTTP_MAX_RETRIES, HTTP_MAX_WORKERS, HTTP_RATE_BURST,
+    HTTP_RATE_PER_S, HTTP_RETRY_AFTER_MAX, HTTP_TIMEOUT_ARCHIVES, HTTP_TIMEOUT_MONTH, USER_AGENT
+)
+from http_cache import ResponseCache, default_cache, month_closed_before
+from json_stream import READ_CHUNK, iter_array_items
+from rate_limit import AdaptiveConcurrency, TokenBucket, backoff_delay, retry_after_seconds
+import metrics
+
+log = logging.getLogger(__name__)
+
+API_BASE = CHESSCOM_API_BASE
+
+# Respuestas que se reintentan (los GET son idempotentes). Chess.com responde 429 al superar
+# su ritmo y a veces 403 a ráfagas de descargas; 5xx suelen ser transitorios.
+RETRY_STATUSES = {403, 429, 500, 502, 503, 504}
+# Tope de reintentos por código: 403 también es como Chess.com bloquea un User-Agent,
+# y ese error debe verse enseguida, no tras todos los reintentos
+MAX_RETRIES_BY_STATUS = {403: 1}
+# Respuestas que indican saturación: reducen la concurrencia
+THROTTLE_STATUSES = {403, 429, 503}
+
+# Sin caché en disco, las descargas se guardan en memoria solo hasta este tamaño (luego a disco temporal)
+SPOOL_MAX_BYTES = 1024 * 1024
 
 # Tokens típicos devueltos por Chess.com en el campo "result" del jugador
 WIN_TOKENS = {"win"}
 LOSS_TOKENS = {"checkmated", "resigned", "timeout", "lose", "abandoned", "mate", "flagged"}
 
-# Si quieres contar empates, añade aquí los tokens y devuelve "Empate"
-DRAW_TOKENS = {"agreed", "repetition", "stalemate", "insufficient", "timevsinsufficient"}
+# Empates: classify_games los devuelve como OUTCOME_DRAW (map_result_for_player, como None)
+DRAW_TOKENS = {"agreed", "repetition", "stalemate", "insufficient", "timevsinsufficient", "50move"}
+
+# Códigos de resultado de classify_games (desde el punto de vista del jugador)
+OUTCOME_OTHER = 0 # token desconocido o partida en la que no juega 'username'
+OUTCOME_WIN = 1
+OUTCOME_LOSS = 2
+OUTCOME_DRAW = 3
+OUTCOME_LABELS = {OUTCOME_WIN: "Ganada", OUTCOME_LOSS: "Perdida", OUTCOME_DRAW: "Empate"}
+
+_OUTCOME_BY_TOKEN = {
+    **{t: OUTCOME_WIN for t in WIN_TOKENS},
+    **{t: OUTCOME_LOSS for t in LOSS_TOKENS},
+    **{t: OUTCOME_DRAW for t in DRAW_TOKENS},
+}
+_EPOCH = date(1970, 1, 1)
+
+
+@dataclass
+class GameColumns:
+    """
+    Partidas de un lote en columnas (una lista por campo, mismo índice = misma partida).
+    side es "white"/"black" (None si 'username' no juega) y end_time 0 si falta.
+    """
+    outcome: list[int] = field(default_factory=list)
+    opponent: list[str | None] = field(default_factory=list)
+    side: list[str | None] = field(default_factory=list)
+    end_time: list[int] = field(default_factory=list)
+    end_date: list[date | None] = field(default_factory=list)
+    rating: list[int | None] = field(default_factory=list)
+    opponent_rating: list[int | None] = field(default_factory=list)
+    time_class: list[str | None] = field(default_factory=list)
+    game_uuid: list[str | None] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.outcome)
+
+
+def classify_games(games: Iterable[dict], username: str) -> GameColumns:
+    """
+    Clasifica un lote de partidas de 'username' en una sola pasada y lo devuelve en columnas:
+    resultado (OUTCOME_*), oponente, color, fecha de fin (UTC), ratings, ritmo y uuid (o URL).
+    El username se normaliza una vez por lote y las fechas se calculan una vez por día distinto.
+    """
+    u = username.lower()
+    cols = GameColumns()
+    outcome, opponent, side = cols.outcome, cols.opponent, cols.side
+    end_time, end_date = cols.end_time, cols.end_date
+    rating, opponent_rating = cols.rating, cols.opponent_rating
+    time_class, game_uuid = cols.time_class, cols.game_uuid
+    token_outcome = _OUTCOME_BY_TOKEN.get
+    days: dict[int, date] = {}
+    empty: dict = {}
+
+    for g in games:
+        white = g.get("white") or empty
+        black = g.get("black") or empty
+        if (white.get("username") or "").lower() == u:
+            me, other, color = white, black, "white"
+        elif (black.get("username") or "").lower() == u:
+            me, other, color = black, white, "black"
+        else:
+            me, other, color = empty, empty, None
+
+        outcome.append(token_outcome((me.get("result") or "").lower(), OUTCOME_OTHER) if color else OUTCOME_OTHER)
+        opponent.append(other.get("username") if color else None)
+        side.append(color)
+        rating.append(me.get("rating"))
+        opponent_rating.append(other.get("rating"))
+        time_class.append(g.get("time_class"))
+        game_uuid.append(g.get("uuid") or g.get("url"))
+
+        ts = g.get("end_time") or 0
+        end_time.append(ts)
+        if ts:
+            day = ts // 86400
+            d = days.get(day)
+            if d is None:
+                d = days[day] = _EPOCH + timedelta(days=day)
+            end_date.append(d)
+        else:
+            end_date.append(None)
+    return cols
+
 
 def map_result_for_player(game_json: dict, username: str) -> str | None:
     """
     Devuelve "Ganada", "Perdida" o None (empate/otros) para el 'username' dado.
+    Una sola partida: la clasificación es la de classify_games (una sola tabla de tokens).
     """
-    u = username.lower()
-    white = game_json.get("white", {})
-    black = game_json.get("black", {})
-    # ¿jugaste con blancas o negras?
-    if white.get("username", "").lower() == u:
-        my_res = (white.get("result") or "").lower()
-        
-    
-    elif black.get("username", "").lower() == u:
-        my_res = (black.get("result") or "").lower()
-           
-    else:
-        return None  # partida de otra persona (no debería pasar)
-
-    if my_res in WIN_TOKENS:
-        return "Ganada"
-    if my_res in LOSS_TOKENS:
-        return "Perdida"
-    
-    # Si quieres guardar empates, desconecta
-    # if my_res in DRAW_TOKENS:
-    #     return "Empate"
-    return None # ignorar empates/otros por ahora
+    outcome = classify_games([game_json], username).outcome[0]
+    return OUTCOME_LABELS[outcome] if outcome in (OUTCOME_WIN, OUTCOME_LOSS) else None
+
+
+def archive_month(month_url: str) -> str:
+    """
+    'https://api.chess.com/pub/player/x/games/2024/05' -> '2024/05'
+    (El formato permite comparar meses como strings.)
+    """
+    return "/".join(month_url.rstrip("/").split("/")[-2:])
+
+
+class ChessComError(Exception):
+    """
+    Error "esperado" de la API de Chess.com (403, 404...) con un mensaje listo para mostrar.
+    """
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ChessComClient:
+    """
+    Cliente HTTP para la API pública de Chess.com.
+    - Reutiliza conexiones keep-alive (requests.Session + pool de conexiones)
+    - Descarga los archivos mensuales en paralelo con un tope de concurrencia
+    - Limita el ritmo de peticiones (token bucket) y la concurrencia se adapta (AIMD):
+      baja a la mitad si Chess.com limita (429/403/503) y vuelve a subir si responde bien
+    - Reintenta 429 / 5xx / errores de red con espera exponencial con jitter, respetando Retry-After
+      (si pide esperar más de HTTP_RETRY_AFTER_MAX, falla con ChessComError); 403 solo una vez
+    """
+
+    def __init__(self, max_workers: int = HTTP_MAX_WORKERS, user_agent: str = USER_AGENT,
+                 cache: ResponseCache | None = None, use_cache: bool = True,
+                 rate: float = HTTP_RATE_PER_S, max_retries: int = HTTP_MAX_RETRIES):
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max(0, max_retries)
+        self.bucket = TokenBucket(rate, max(HTTP_RATE_BURST, self.max_workers))
+        self.concurrency = AdaptiveConcurrency(self.max_workers)
+        self.http = requests.Session()
+        self.http.headers["User-Agent"] = user_agent
+        # Un hilo = una conexión del pool; pool_block evita abrir conexiones extra
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.max_workers, pool_block=True)
+        self.http.mount("https://", adapter)
+        self.http.mount("http://", adapter)
+        # Caché en disco con peticiones condicionales (ETag / Last-Modified)
+        self.cache = (cache or default_cache()) if use_cache else None
+
+    @contextmanager
+    def _request(self, url: str, timeout: float, headers: dict | None, abort: threading.Event | None) -> Iterator[requests.Response]:
+        """
+        GET en streaming pasando por el limitador de ritmo y de concurrencia, con reintentos.
+        Entrega la respuesta final (éxito, error no reintentable o el último intento) y mantiene
+        ocupado su hueco de concurrencia mientras se lee el cuerpo.
+        """
+        attempt = 0
+        while True:
+            with metrics.phase("throttle"):
+                if not self.concurrency.acquire(abort):
+                    raise ChessComError(0, "Descarga cancelada")
+            try:
+                with metrics.phase("throttle"):
+                    if not self.bucket.acquire(abort):
+                        raise ChessComError(0, "Descarga cancelada")
+                try:
+                    r = self.http.get(url, timeout=timeout, headers=headers, stream=True)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    reason, delay = type(e).__name__, backoff_delay(attempt, HTTP_BACKOFF_BASE, HTTP_BACKOFF_MAX)
+                else:
+                    metrics.incr("http.requests")
+                    metrics.incr(f"http.status.{r.status_code}")
+                    retries = min(self.max_retries, MAX_RETRIES_BY_STATUS.get(r.status_code, self.max_retries))
+                    if r.status_code not in RETRY_STATUSES or attempt >= retries:
+                        if r.status_code < 400:
+                            self.concurrency.on_success()
+                        with r:
+                            yield r
+                        return
+                    r.close()
+                    if r.status_code in THROTTLE_STATUSES:
+                        self.concurrency.on_throttle()
+                    reason = f"HTTP {r.status_code}"
+                    delay = backoff_delay(attempt, HTTP_BACKOFF_BASE, HTTP_BACKOFF_MAX)
+                    retry_after = retry_after_seconds(r.headers.get("Retry-After"))
+                    if retry_after is not None:
+                        if retry_after > HTTP_RETRY_AFTER_MAX:
+                            # Reintentar antes sería inútil (y gastaría los reintentos): se falla ya
+                            raise ChessComError(
+                                r.status_code,
+                                f"Chess.com pide esperar {retry_after:.0f} s antes de reintentar (HTTP {r.status_code}); "
+                                f"el máximo es {HTTP_RETRY_AFTER_MAX:.0f} s (CHESS_HTTP_RETRY_AFTER_MAX). "
+                                "Vuelve a intentarlo más tarde.",
+                            )
+                        # El servidor pide esperar: se detienen todas las peticiones, no solo esta
+                        delay = max(delay, retry_after)
+                        self.bucket.pause_until(time.monotonic() + delay)
+            finally:
+                self.concurrency.release()
+
+            attempt += 1
+            metrics.incr("http.retries")
+            log.warning("%s en %s; reintento %d/%d en %.1f s (concurrencia %d)",
+                        reason, url, attempt, self.max_retries, delay, int(self.concurrency.limit))
+            with metrics.phase("throttle"):
+                if abort is not None:
+                    if abort.wait(delay):
+                        raise ChessComError(0, "Descarga cancelada")
+                else:
+                    time.sleep(delay)
+
+    def _open(self, url: str, timeout: float, errors: dict[int, str], month: str | None = None,
+              abort: threading.Event | None = None) -> BinaryIO:
+        """
+        GET con caché. Devuelve el cuerpo como archivo binario abierto (en disco o spool):
+        la respuesta nunca se carga entera en memoria.
+        - Meses cerrados ya guardados -> se abren del disco sin tocar la red
+        - Resto -> petición condicional; un 304 reutiliza el cuerpo guardado
+        'errors' mapea códigos HTTP a mensajes de ChessComError (tras agotar los reintentos).
+        'abort' interrumpe las esperas del limitador y de los reintentos.
+        """
+        entry = self.cache.lookup(url) if self.cache else None
+        if entry and entry.immutable:
+            metrics.incr("http.cache_hits")
+            return self.cache.open(entry)
+
+        with self._request(url, timeout, entry.validators() if entry else None, abort) as r:
+            if r.status_code == 304 and entry:
+                metrics.incr("http.cache_hits")
+                return self.cache.open(entry)
+            if r.status_code in errors:
+                raise ChessComError(r.status_code, errors[r.status_code])
+            r.raise_for_status()
+            chunks = _count_bytes(r.iter_content(READ_CHUNK))
+            if self.cache:
+                immutable = month is not None and month_closed_before(month, time.time())
+                return self.cache.store(url, chunks, r.headers, immutable=immutable)
+            spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+            for chunk in chunks:
+                spool.write(chunk)
+            spool.seek(0)
+            return spool
+
+    def get_archives(self, username: str) -> list[str]:
+        """
+        Devuelve la lista de URLs de archivos mensuales del jugador (del más antiguo al más reciente).
+        """
+        fp = self._open(
+            f"{API_BASE}/player/{username}/games/archives",
+            HTTP_TIMEOUT_ARCHIVES,
+            # Errores típicos
+            errors={
+                403: "Chess.com rechazó la solicitud. Agrega un User-Agent con contacto.",
+                404: f"No se encontró el usuario '{username}' en Chess.com.",
+            },
+        )
+        with fp:
+            return json.load(fp).get("archives", [])
+
+    def open_month(self, month_url: str, abort: threading.Event | None = None) -> BinaryIO:
+        """
+        Descarga un archivo mensual y lo devuelve abierto, sin parsear.
+        """
+        with metrics.phase("download"):
+            return self._open(
+                month_url,
+                HTTP_TIMEOUT_MONTH,
+                errors={403: "Chess.com rechazó una descarga mensual. Revisa el User-Agent/ratio."},
+                month=archive_month(month_url),
+                abort=abort,
+            )
+
+    def iter_month_games(self, month_urls: Iterable[str]) -> Iterator[tuple[str, Iterator[dict]]]:
+        """
+        Descarga los meses en paralelo (hasta max_workers a la vez) y los entrega
+        en el mismo orden en que se pidieron como pares (month_url, partidas).
+        Las partidas de cada mes se parsean en streaming, una a una, al iterarlas.
+        Solo hay unos pocos meses "en vuelo" a la vez, así la memoria no crece con el historial.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="chesscom")
+        abort = threading.Event()
+        pending = deque()
+        try:
+            for url in month_urls:
+                pending.append((url, metrics.submit_in_context(executor, self.open_month, url, abort)))
+                if len(pending) >= self.max_workers * 2:
+                    url_done, fut = pending.popleft()
+                    yield url_done, _iter_games(_wait(fut))
+            while pending:
+                url_done, fut = pending.popleft()
+                yield url_done, _iter_games(_wait(fut))
+        finally:
+            # Si algo falla (o se deja de iterar), no seguir descargando en segundo plano
+            abort.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+            for _, fut in pending:
+                if not fut.cancelled() and fut.exception() is None:
+                    fut.result().close()
+
+    def close(self) -> None:
+        self.http.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _iter_games(fp: BinaryIO) -> Iterator[dict]:
+    """
+    Partidas de un archivo mensual, una a una; cierra el archivo al terminar.
+    """
+    with fp:
+        yield from iter_array_items(fp, "games")
+
+
+def _wait(fut) -> BinaryIO:
+    """
+    Resultado de una descarga; el tiempo que se bloquea aquí es la fase 'download_wait'
+    (si domina, la red es el cuello de botella).
+    """
+    with metrics.phase("download_wait"):
+        return fut.result()
+
+
+def _count_bytes(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    n = 0
+    try:
+        for chunk in chunks:
+            n += len(chunk)
+            yield chunk
+    finally:
+        metrics.incr("http.bytes", n)
@@ -0,0 +1,283 @@
+"""
+Estadísticas sobre 'chess_records': media móvil de victorias, rachas, cara a cara por
+oponente y desglose mensual.
+
+Todo se calcula en SQL (funciones de ventana / resumen precalculado de record_stats),
+nunca recorriendo objetos del ORM. Los resultados se memorizan y solo se invalidan
+cuando un commit toca los datos de los que dependen (ver models.on_record_changes):
+p.ej. sincronizar partidas contra 'pepe' no invalida el cara a cara con 'juan'.
+"""
+import datetime as dt
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from sqlalchemy import String, case, cast, func, or_, select
+
+from models import ALL_CHANGES, ChessRecord, RecordStat, on_record_changes, read_stats, read_totals
+
+RESULTS = ("Ganada", "Perdida")
+ROLLING_WINDOWS = (20, 100) # ventanas (en partidas) de la media móvil
+
+
+@dataclass(frozen=True)
+class Streak:
+    """
+    Racha de resultados iguales consecutivos (en orden de fecha).
+    """
+    result: str
+    length: int
+    start: dt.date | None
+    end: dt.date | None
+
+
+class AnalyticsCache:
+    """
+    Memoriza resultados junto con las etiquetas de las que dependen.
+    invalidate(tags) descarta solo las entradas que comparten alguna etiqueta.
+    Seguro entre hilos: un cálculo que se solapa con una invalidación no se guarda.
+    """
+
+    def __init__(self):
+        self._entries: dict[tuple, tuple[object, frozenset]] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, tags: set[str], compute: Callable[[], object]):
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key][0]
+            generation = self._generation
+        value = compute()
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (value, frozenset(tags))
+        return value
+
+    def invalidate(self, tags: set[str]) -> None:
+        with self._lock:
+            self._generation += 1
+            if ALL_CHANGES in tags:
+                self._entries.clear()
+                return
+            for key in [k for k, (_, deps) in self._entries.items() if deps & tags]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        self.invalidate({ALL_CHANGES})
+
+
+cache = AnalyticsCache()
+on_record_changes(cache.invalidate)
+
+
+# --- Consultas ---
+
+def _game_order(desc: bool = False) -> tuple:
+    """
+    Orden cronológico de las partidas: fecha y, a igual fecha, id (usa el índice de fecha).
+    Cada motor ubica las fechas NULL en un extremo distinto (SQLite al principio, PostgreSQL
+    al final): las consultas que dependen del orden filtran antes con _HAS_DATE.
+    """
+    if desc:
+        return ChessRecord.date.desc(), ChessRecord.id.desc()
+    return ChessRecord.date.asc(), ChessRecord.id.asc()
+
+
+# Solo se guardan 'Ganada' / 'Perdida'. Filtrar por "no nulo" (y no con IN) deja que el
+# planificador recorra el índice de fecha en orden en vez del índice de resultado.
+_HAS_RESULT = ChessRecord.result.is_not(None)
+# Las partidas sin fecha (manuales) no tienen lugar en el orden: no cuentan en la media móvil,
+# las rachas ni los últimos resultados del cara a cara (sí en los totales y los conteos)
+_HAS_DATE = ChessRecord.date.is_not(None)
+
+
+def _win(result_col):
+    return case((result_col == "Ganada", 1.0), else_=0.0)
+
+
+def _rate(wins: int, losses: int) -> float | None:
+    return wins / (wins + losses) if wins + losses else None
+
+
+def current_win_rate(session, window: int) -> float | None:
+    """
+    Porcentaje de victorias (0..1) en las últimas 'window' partidas.
+    """
+    def compute():
+        last = (
+            select(ChessRecord.result)
+            .where(_HAS_RESULT, _HAS_DATE)
+            .order_by(*_game_order(desc=True))
+            .limit(window)
+            .subquery()
+        )
+        n, wins = session.execute(select(func.count(), func.sum(_win(last.c.result)))).one()
+        return float(wins or 0) / n if n else None
+
+    return cache.get(("current_win_rate", window), {"records"}, compute)
+
+
+def rolling_win_rate_by_month(session, window: int) -> dict[str, float]:
+    """
+    Media móvil de victorias de 'window' partidas al terminar cada mes: {'YYYY-MM': 0..1}.
+    Una sola pasada ordenada: AVG(...) OVER (ROWS BETWEEN window-1 PRECEDING AND CURRENT ROW)
+    y LEAD(mes) para quedarse con la última partida de cada mes.
+    """
+    def compute():
+        order = _game_order()
+        month = func.substr(cast(ChessRecord.date, String), 1, 7)
+        seq = (
+            select(
+                month.label("month"),
+                func.avg(_win(ChessRecord.result)).over(order_by=order, rows=(-(window - 1), 0)).label("rolling"),
+                func.lead(month).over(order_by=order).label("next_month"),
+            )
+            .where(_HAS_RESULT, _HAS_DATE)
+            .subquery()
+        )
+        rows = session.execute(
+            select(seq.c.month, seq.c.rolling)
+            .where(or_(seq.c.next_month.is_(None), seq.c.next_month != seq.c.month))
+        )
+        return {month: float(rate) for month, rate in rows}
+
+    return cache.get(("rolling_win_rate_by_month", window), {"records"}, compute)
+
+
+def _streaks(session) -> tuple[dict[str, Streak], Streak | None]:
+    """
+    Rachas más largas de cada resultado y racha en curso, en una sola consulta
+    ("gaps and islands": posición global - posición dentro de su resultado es constante
+    en cada racha). Si hay empate en longitud gana la más reciente.
+    """
+    def compute():
+        base = (
+            select(ChessRecord.date, ChessRecord.result, func.row_number().over(order_by=_game_order()).label("pos"))
+            .where(_HAS_RESULT, _HAS_DATE)
+            .subquery()
+        )
+        seq = select(
+            base.c.date,
+            base.c.result,
+            base.c.pos,
+            (base.c.pos - func.row_number().over(partition_by=base.c.result, order_by=base.c.pos)).label("grp"),
+        ).subquery()
+        length, last = func.count(), func.max(seq.c.pos)
+        groups = (
+            select(
+                seq.c.result,
+                length.label("length"),
+                func.min(seq.c.date).label("start"),
+                func.max(seq.c.date).label("end"),
+                func.row_number().over(partition_by=seq.c.result, order_by=(length.desc(), last.desc())).label("rk"),
+                func.row_number().over(order_by=last.desc()).label("recent"),
+            )
+            .group_by(seq.c.result, seq.c.grp)
+            .subquery()
+        )
+        longest, current = {}, None
+        for res, n, start, end, rk, recent in session.execute(select(groups).where(or_(groups.c.rk == 1, groups.c.recent == 1))):
+            streak = Streak(res, n, start, end)
+            if rk == 1:
+                longest[res] = streak
+            if recent == 1:
+                current = streak
+        return longest, current
+
+    return cache.get(("streaks",), {"records"}, compute)
+
+
+def longest_streaks(session) -> dict[str, Streak]:
+    """
+    Racha más larga de cada resultado: {'Ganada': Streak, 'Perdida': Streak}.
+    """
+    return _streaks(session)[0]
+
+
+def current_streak(session) -> Streak | None:
+    """
+    Racha en curso (la que incluye la última partida).
+    """
+    return _streaks(session)[1]
+
+
+def monthly_breakdown(session) -> list[tuple[str, int, int]]:
+    """
+    [(mes 'YYYY-MM', ganadas, perdidas)] en orden cronológico (del resumen record_stats).
+    """
+    def compute():
+        stats = read_stats(session, "month")
+        return [(m, stats[m].get("Ganada", 0), stats[m].get("Perdida", 0)) for m in sorted(stats)]
+
+    return cache.get(("monthly_breakdown",), {"months"}, compute)
+
+
+def top_opponents(session, limit: int = 100) -> list[tuple[str, int, int]]:
+    """
+    [(oponente, ganadas, perdidas)] de los oponentes con más partidas (del resumen record_stats).
+    """
+    def compute():
+        wins = func.sum(case((RecordStat.result == "Ganada", RecordStat.count), else_=0))
+        losses = func.sum(case((RecordStat.result == "Perdida", RecordStat.count), else_=0))
+        rows = session.execute(
+            select(RecordStat.bucket, wins, losses)
+            .where(RecordStat.dimension == "opponent")
+            .group_by(RecordStat.bucket)
+            .having(func.sum(RecordStat.count) > 0)
+            .order_by(func.sum(RecordStat.count).desc(), RecordStat.bucket)
+            .limit(limit)
+        )
+        return [(opp, int(w), int(l)) for opp, w, l in rows]
+
+    return cache.get(("top_opponents", limit), {"opponents"}, compute)
+
+
+def head_to_head(session, opponent: str, recent: int = 10) -> dict:
+    """
+    Cara a cara contra 'opponent': ganadas, perdidas, primera y última fecha y los
+    últimos 'recent' resultados (el más reciente primero, 'G'/'P').
+    """
+    def compute():
+        rows = session.execute(
+            select(ChessRecord.result, func.count(), func.min(ChessRecord.date), func.max(ChessRecord.date))
+            .where(ChessRecord.opponent == opponent, ChessRecord.result.in_(RESULTS))
+            .group_by(ChessRecord.result)
+        ).all()
+        counts = {res: n for res, n, _, _ in rows}
+        firsts = [d for _, _, d, _ in rows if d]
+        lasts = [d for _, _, _, d in rows if d]
+        last_results = session.scalars(
+            select(ChessRecord.result)
+            .where(ChessRecord.opponent == opponent, ChessRecord.result.in_(RESULTS), _HAS_DATE)
+            .order_by(*_game_order(desc=True))
+            .limit(recent)
+        ).all()
+        wins, losses = counts.get("Ganada", 0), counts.get("Perdida", 0)
+        return {
+            "opponent": opponent,
+            "wins": wins,
+            "losses": losses,
+            "win_rate": _rate(wins, losses),
+            "first": min(firsts) if firsts else None,
+            "last": max(lasts) if lasts else None,
+            "recent": "".join("G" if r == "Ganada" else "P" for r in last_results),
+        }
+
+    return cache.get(("head_to_head", opponent, recent), {f"opponent:{opponent}"}, compute)
+
+
+def summary(session) -> dict:
+    """
+    Todo lo que muestra el panel de estadísticas (cada parte memorizada por separado).
+    """
+    totals = read_totals(session)
+    wins, losses = totals.get("Ganada", 0), totals.get("Perdida", 0)
+    return {
+        "wins": wins,
+        "losses": losses,
+        "win_rate": _rate(wins, losses),
+        "rolling": {n: current_win_rate(session, n) for n in ROLLING_WINDOWS},
+        "longest": longest_streaks(session),
+        "current": current_streak(session),
+    }
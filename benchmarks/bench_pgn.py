@@ -0,0 +1,91 @@
+"""
+Benchmark del análisis de PGN (pgn_enrich.py) con distinto número de procesos.
+
+Genera partidas sintéticas (las mismas que sirve fake_chesscom.py), las analiza con
+PgnEnricher.parse_many para cada número de procesos indicado y escribe en JSON el
+throughput (PGN/s) y la aceleración respecto a un solo proceso. El arranque del pool se
+mide aparte (se hace una pasada de calentamiento antes de medir). Ejemplos:
+
+    python benchmarks/bench_pgn.py
+    python benchmarks/bench_pgn.py --games 50000 --pgn-bytes 4000 --workers 1 2 4 8 -o pgn.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_chesscom import FakeDataSpec, make_month  # noqa: E402
+from pgn_enrich import PgnEnricher  # noqa: E402
+
+BENCH_USERNAME = "benchplayer"
+GAMES = 50000
+REPEAT = 3 # pasadas medidas por número de procesos (se reporta la mejor)
+
+
+def make_pgns(games: int, pgn_bytes: int) -> list[str]:
+    spec = FakeDataSpec(games_per_month=games, pgn_bytes=pgn_bytes)
+    return [g["pgn"] for g in make_month(spec, BENCH_USERNAME, spec.start_year, 1)["games"]]
+
+
+def measure(pgns: list[str], workers: int, repeat: int) -> dict:
+    with PgnEnricher(workers) as enricher:
+        t0 = time.perf_counter()
+        enricher.parse_many(pgns[:max(len(pgns) // 100, 1000)]) # arranca el pool
+        startup = time.perf_counter() - t0
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            enricher.parse_many(pgns)
+            best = min(best, time.perf_counter() - t0)
+    return {"workers": workers, "seconds": round(best, 3), "pgn_per_s": round(len(pgns) / best, 1),
+            "warmup_seconds": round(startup, 3)}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark del análisis de PGN en paralelo")
+    parser.add_argument("--games", type=int, default=GAMES)
+    parser.add_argument("--pgn-bytes", type=int, default=FakeDataSpec.pgn_bytes, help="Tamaño aproximado de cada PGN")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        help="Números de procesos a medir (por defecto 1, 2, 4... hasta los núcleos)")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("-o", "--output", help="Archivo JSON de salida (por defecto stdout)")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    cpus = os.cpu_count() or 1
+    workers = args.workers or sorted({1, cpus} | {2 ** i for i in range(1, cpus.bit_length()) if 2 ** i <= cpus})
+    pgns = make_pgns(args.games, args.pgn_bytes)
+
+    results = [measure(pgns, n, args.repeat) for n in workers]
+    base = next((r["seconds"] for r in results if r["workers"] == 1), None)
+    for r in results:
+        r["speedup"] = round(base / r["seconds"], 2) if base else None
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": cpus,
+        "games": len(pgns),
+        "pgn_mb": round(sum(map(len, pgns)) / (1024 * 1024), 1),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""
+Benchmark de la sincronización contra una imitación local de Chess.com.
+
+Mide, por cada base de datos indicada:
+- throughput de la sincronización completa (partidas/s, insertadas/s)
+- tasa de inserción en bloque (filas/s de bulk_insert_records)
+- latencia de refresh_table (consulta de la primera página + totales; y la vista Tk si hay display)
+- reconstrucción de los registros desde el almacén local de partidas (sin red)
+- exportación e importación de los registros (en PostgreSQL, por COPY), y una reimportación
+  que no debe insertar nada
+- memoria pico del proceso (tracemalloc + ru_maxrss)
+y escribe el resultado en JSON (stdout o --output).
+
+Cada base de datos se mide en un subproceso propio (config.py lee el entorno al importarse)
+y el servidor falso corre en otro, así su memoria no cuenta. La BD debe estar vacía: al
+terminar se vacía de nuevo. Ejemplos:
+
+    python benchmarks/bench_sync.py
+    python benchmarks/bench_sync.py --months 24 --games-per-month 2000 --draw-ratio 0.2 \\
+        --db-url sqlite:////tmp/bench.db --db-url postgresql://user:pw@localhost/bench -o out.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_chesscom import FakeDataSpec, api_base, serve  # noqa: E402
+
+BENCH_USERNAME = "benchplayer"
+REFRESH_REPEAT = 20 # mediciones de refresh (se reporta la mediana)
+INSERT_ROWS = 20000 # filas de la prueba de inserción en bloque
+
+
+def _serve_forever(spec: FakeDataSpec, conn) -> None:
+    server = serve(spec)
+    conn.send(api_base(server))
+    conn.recv() # espera la orden de parar
+    server.shutdown()
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        return None # Windows
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def _measure_tk_refresh(repeat: int) -> float | None:
+    """
+    Latencia de ChessApp.refresh_table con widgets reales. None si no hay display.
+    """
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return None
+    try:
+        from GameStatOnlineChess import ChessApp
+        app = ChessApp(root)
+
+        def refresh():
+            app.refresh_table()
+            root.update_idletasks()
+
+        return _median_ms(refresh, repeat)
+    finally:
+        root.destroy()
+
+
+def run_child(params: dict) -> dict:
+    """
+    Mide una base de datos (se ejecuta en el subproceso, con el entorno ya configurado).
+    """
+    import tracemalloc
+
+    from sqlalchemy import func, select
+
+    import metrics
+    from chess_sync import rebuild_from_store, sync_player
+    from game_store import GameStore
+    from models import (
+        ChessRecord, bulk_insert_records, clear_all_records, fetch_records_page, get_engine, read_totals, session_scope
+    )
+    from OnlineChessAPI import ChessComClient
+    from records_io import export_records, import_records, open_records_file
+
+    engine = get_engine()
+    with session_scope(commit=False) as session:
+        if session.scalar(select(func.count()).select_from(ChessRecord)):
+            raise SystemExit(f"La BD {engine.url!r} no está vacía; el benchmark necesita una BD vacía.")
+
+    result = {"dialect": engine.dialect.name, "url": engine.url.render_as_string(hide_password=True)}
+    try:
+        # 1) Sincronización completa (HTTP + parseo + dedup + inserción + commit)
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        store = GameStore(params["store_dir"])
+        with metrics.collect("bench sync") as m, ChessComClient(max_workers=params["http_workers"]) as client, \
+                session_scope() as session:
+            stats = sync_player(session, client, BENCH_USERNAME, None, store=store)
+        elapsed = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["sync"] = {
+            "seconds": round(elapsed, 3),
+            "months": stats.months,
+            "games_scanned": stats.scanned,
+            "rows_inserted": stats.inserted,
+            "games_per_s": round(stats.scanned / elapsed, 1),
+            "inserted_per_s": round(stats.inserted / elapsed, 1),
+            "tracemalloc_peak_mb": round(peak / (1024 * 1024), 2),
+            "metrics": m.as_dict(),
+        }
+
+        # 2) Reconstrucción desde el almacén local (sin HTTP)
+        t0 = time.perf_counter()
+        with metrics.collect("bench rebuild") as m, session_scope() as session:
+            rebuilt = rebuild_from_store(session, store, [BENCH_USERNAME])
+        elapsed = time.perf_counter() - t0
+        result["rebuild"] = {
+            "seconds": round(elapsed, 3),
+            "games_scanned": rebuilt.scanned,
+            "rows_inserted": rebuilt.inserted,
+            "games_per_s": round(rebuilt.scanned / elapsed, 1),
+            "store_mb": round(store.size_bytes() / (1024 * 1024), 2),
+            "metrics": m.as_dict(),
+        }
+
+        # 3) Inserción en bloque aislada (sin HTTP ni dedup)
+        rows = [
+            {"opponent": f"bulk{i % 500}", "result": "Ganada" if i % 2 else "Perdida", "date": None,
+             "game_uuid": f"bulk-{i}", "username": "benchbulk"}
+            for i in range(INSERT_ROWS)
+        ]
+        t0 = time.perf_counter()
+        with session_scope() as session:
+            bulk_insert_records(session, rows)
+        elapsed = time.perf_counter() - t0
+        result["bulk_insert"] = {"rows": len(rows), "seconds": round(elapsed, 3), "rows_per_s": round(len(rows) / elapsed, 1)}
+
+        # 4) Exportación a CSV, importación en la tabla vacía y reimportación (todo duplicado)
+        path = params["store_dir"] + ".csv.gz"
+        t0 = time.perf_counter()
+        with session_scope(commit=False) as session, open_records_file(path, "w") as fp:
+            exported = export_records(session, fp, "csv")
+        export_s = time.perf_counter() - t0
+        with session_scope() as session:
+            clear_all_records(session)
+        imports = []
+        for label in ("import", "reimport"):
+            t0 = time.perf_counter()
+            with metrics.collect(f"bench {label}") as m, open_records_file(path, "r") as fp, \
+                    session_scope() as session:
+                imported = import_records(session, fp, "csv")
+            imports.append((label, imported, time.perf_counter() - t0, m))
+        if imports[0][1].inserted != exported or imports[1][1].inserted:
+            raise SystemExit(f"Importación inconsistente: {exported} exportadas, "
+                             f"{[(label, st.inserted) for label, st, _, _ in imports]} insertadas")
+        result["export_import"] = {
+            "rows": exported,
+            "export_seconds": round(export_s, 3),
+            "export_rows_per_s": round(exported / export_s, 1),
+            "file_mb": round(os.path.getsize(path) / (1024 * 1024), 2),
+        }
+        for label, imported, elapsed, m in imports:
+            result["export_import"][label] = {
+                "seconds": round(elapsed, 3),
+                "rows_inserted": imported.inserted,
+                "rows_per_s": round(imported.read / elapsed, 1),
+                "metrics": m.as_dict(),
+            }
+
+        # 5) Refresh: primera página + totales (lo que hace refresh_table contra la BD),
+        #    con una sesión corta por refresco como la app
+        def refresh():
+            with session_scope(commit=False) as session:
+                fetch_records_page(session)
+                read_totals(session)
+
+        result["refresh"] = {
+            "db_median_ms": _median_ms(refresh, params["refresh_repeat"]),
+            "tk_median_ms": _measure_tk_refresh(params["refresh_repeat"]),
+        }
+    finally:
+        with engine.begin() as conn:
+            clear_all_records(conn)
+
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_parser() -> argparse.ArgumentParser:
+    defaults = FakeDataSpec()
+    parser = argparse.ArgumentParser(description="Benchmark de sincronización con una API de Chess.com simulada")
+    parser.add_argument("--db-url", action="append", dest="db_urls",
+                        help="URL de SQLAlchemy de una BD vacía (repetible). Por defecto un SQLite temporal")
+    parser.add_argument("--months", type=int, default=defaults.months)
+    parser.add_argument("--games-per-month", type=int, default=defaults.games_per_month)
+    parser.add_argument("--draw-ratio", type=float, default=defaults.draw_ratio)
+    parser.add_argument("--pgn-bytes", type=int, default=defaults.pgn_bytes, help="Tamaño aproximado de cada PGN")
+    parser.add_argument("--opponents", type=int, default=defaults.opponents)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--throttle-ratio", type=float, default=defaults.throttle_ratio,
+                        help="Fracción de respuestas 429 del servidor simulado")
+    parser.add_argument("--http-workers", type=int, default=8)
+    parser.add_argument("--refresh-repeat", type=int, default=REFRESH_REPEAT)
+    parser.add_argument("-o", "--output", help="Archivo JSON de salida (por defecto stdout)")
+    parser.add_argument("--child", help=argparse.SUPPRESS) # uso interno: archivo de resultados del subproceso
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.child:
+        params = json.loads(os.environ["CHESS_BENCH_PARAMS"])
+        with open(args.child, "w", encoding="utf-8") as f:
+            json.dump(run_child(params), f)
+        return 0
+
+    spec = FakeDataSpec(months=args.months, games_per_month=args.games_per_month, draw_ratio=args.draw_ratio,
+                        pgn_bytes=args.pgn_bytes, opponents=args.opponents, seed=args.seed,
+                        throttle_ratio=args.throttle_ratio)
+    params = {"http_workers": args.http_workers, "refresh_repeat": args.refresh_repeat}
+
+    parent_conn, child_conn = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=_serve_forever, args=(spec, child_conn), daemon=True)
+    server.start()
+    base = parent_conn.recv()
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "git_commit": _git_commit(),
+        "spec": asdict(spec),
+        "params": params,
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        db_urls = args.db_urls or [f"sqlite:///{os.path.join(tmp, 'bench.db')}"]
+        for i, url in enumerate(db_urls):
+            out = os.path.join(tmp, f"result{i}.json")
+            child_params = dict(params, store_dir=os.path.join(tmp, f"store{i}"))
+            env = dict(os.environ, CHESS_DATABASE_URL=url, CHESS_API_BASE=base, CHESS_HTTP_CACHE_DIR="",
+                       CHESS_BENCH_PARAMS=json.dumps(child_params))
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", out], env=env, cwd=ROOT,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            if proc.returncode != 0:
+                print(f"[ERROR] {url}: {proc.stderr.strip().splitlines()[-1:]}", file=sys.stderr)
+                report["results"].append({"url": url, "error": proc.stderr.strip()[-2000:]})
+                continue
+            with open(out, encoding="utf-8") as f:
+                report["results"].append(json.load(f))
+
+    parent_conn.send("stop")
+    server.join(timeout=5)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0 if all("error" not in r for r in report["results"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+Imitación local de la API pública de Chess.com para benchmarks.
+
+Genera archivos mensuales sintéticos con la misma forma que las respuestas reales
+(/pub/player/{user}/games/archives y /pub/player/{user}/games/{yyyy}/{mm}) y los
+sirve por HTTP en 127.0.0.1. Los datos son deterministas para una misma semilla.
+"""
+import json
+import random
+import threading
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WIN_RESULTS = ("checkmated", "resigned", "timeout", "abandoned")
+DRAW_RESULTS = ("agreed", "repetition", "stalemate", "insufficient", "timevsinsufficient")
+TIME_CLASSES = ("bullet", "blitz", "rapid", "daily")
+ECO_CODES = ("B01", "C50", "D02", "A45", "E60", "B90", "C42")
+MOVES = ("e4", "e5", "Nf3", "Nc6", "Bb5", "a6", "Ba4", "Nf6", "O-O", "Be7", "d4", "d5", "c4", "exd5")
+
+
+@dataclass(frozen=True)
+class FakeDataSpec:
+    """
+    Forma de los datos sintéticos.
+    """
+    months: int = 12
+    games_per_month: int = 500
+    draw_ratio: float = 0.1
+    pgn_bytes: int = 1500
+    opponents: int = 300
+    start_year: int = 2020
+    seed: int = 1
+    throttle_ratio: float = 0.0 # fracción de peticiones respondidas con 429 (para probar reintentos)
+
+
+def month_list(spec: FakeDataSpec) -> list[tuple[int, int]]:
+    months = []
+    year, mon = spec.start_year, 1
+    for _ in range(spec.months):
+        months.append((year, mon))
+        year, mon = (year + 1, 1) if mon == 12 else (year, mon + 1)
+    return months
+
+
+def _pgn(rng: random.Random, eco: str, result: str, size: int) -> str:
+    headers = f'[Event "Live Chess"]\n[Site "Chess.com"]\n[Result "{result}"]\n[ECO "{eco}"]\n\n'
+    parts = []
+    n = 1
+    length = len(headers)
+    while length < size:
+        move = f"{n}. {rng.choice(MOVES)} {rng.choice(MOVES)} "
+        parts.append(move)
+        length += len(move)
+        n += 1
+    return headers + "".join(parts) + result
+
+
+def make_month(spec: FakeDataSpec, username: str, year: int, mon: int) -> dict:
+    """
+    Payload de un archivo mensual: {"games": [...]} con partidas de 'username'.
+    """
+    rng = random.Random(f"{spec.seed}-{username}-{year}-{mon}")
+    start = datetime(year, mon, 1, tzinfo=timezone.utc).timestamp()
+    games = []
+    for i in range(spec.games_per_month):
+        r = rng.random()
+        as_white = rng.random() < 0.5
+        if r < spec.draw_ratio:
+            mine = theirs = rng.choice(DRAW_RESULTS)
+            pgn_result = "1/2-1/2"
+        else:
+            won = r < spec.draw_ratio + (1 - spec.draw_ratio) / 2
+            mine = "win" if won else rng.choice(WIN_RESULTS)
+            theirs = rng.choice(WIN_RESULTS) if won else "win"
+            pgn_result = "1-0" if won == as_white else "0-1"
+        me = {"username": username, "rating": rng.randint(800, 2800), "result": mine}
+        other = {"username": f"opponent{rng.randrange(spec.opponents)}", "rating": rng.randint(800, 2800), "result": theirs}
+        eco = rng.choice(ECO_CODES)
+        uuid = f"{spec.seed:04x}{year:04d}{mon:02d}-{i:08x}-{zlib.crc32(username.encode()):08x}"
+        games.append({
+            "url": f"https://www.chess.com/game/live/{year}{mon:02d}{i}",
+            "pgn": _pgn(rng, eco, pgn_result, spec.pgn_bytes),
+            "time_control": "180+2",
+            "end_time": int(start + i * 60 + rng.randint(0, 59)),
+            "rated": True,
+            "uuid": uuid,
+            "time_class": rng.choice(TIME_CLASSES),
+            "rules": "chess",
+            "eco": f"https://www.chess.com/openings/{eco}",
+            "white": me if as_white else other,
+            "black": other if as_white else me,
+        })
+    return {"games": games}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    spec: FakeDataSpec = FakeDataSpec()
+
+    def log_message(self, *args):
+        pass # sin ruido en la consola
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        # pub/player/{user}/games/archives | pub/player/{user}/games/{yyyy}/{mm}
+        if len(parts) < 5 or parts[:2] != ["pub", "player"] or parts[3] != "games":
+            self.send_error(404)
+            return
+        username = parts[2]
+        if self.spec.throttle_ratio and random.random() < self.spec.throttle_ratio:
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if parts[4] == "archives":
+            base = f"http://{self.server.server_address[0]}:{self.server.server_address[1]}/pub/player/{username}/games"
+            body = json.dumps({"archives": [f"{base}/{y}/{m:02d}" for y, m in month_list(self.spec)]}).encode()
+        elif len(parts) == 6:
+            body = _month_body(self.spec, username, int(parts[4]), int(parts[5]))
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@lru_cache(maxsize=64)
+def _month_body(spec: FakeDataSpec, username: str, year: int, mon: int) -> bytes:
+    return json.dumps(make_month(spec, username, year, mon)).encode()
+
+
+def serve(spec: FakeDataSpec, port: int = 0) -> ThreadingHTTPServer:
+    """
+    Arranca el servidor en un hilo y lo devuelve (server.server_address tiene el puerto).
+    """
+    handler = type("Handler", (_Handler,), {"spec": spec})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-chesscom", daemon=True).start()
+    return server
+
+
+def api_base(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/pub"
@@ -0,0 +1,245 @@
+"""
+Comprobaciones rápidas (sin red externa ni BD) de la lógica que el benchmark solo ejercita
+de pasada:
+- json_stream.iter_array_items con el JSON cortado en todos los puntos posibles
+  (a mitad de cadena, de número, de carácter UTF-8 multibyte...)
+- rate_limit: AdaptiveConcurrency (baja a la mitad y se recupera), TokenBucket.pause_until
+  y la lectura de Retry-After
+- ChessComClient._request contra un servidor local con respuestas guionizadas
+  (reintento tras 429 + Retry-After, Retry-After demasiado largo, 403 reintentado una sola vez,
+  5xx hasta agotar los reintentos, 404 sin reintentos)
+
+Termina con código 0 si todo pasa. Ejemplo:
+
+    python benchmarks/selfcheck.py
+"""
+import io
+import json
+import os
+import sys
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests  # noqa: E402
+
+import OnlineChessAPI  # noqa: E402
+from json_stream import iter_array_items  # noqa: E402
+from OnlineChessAPI import ChessComClient, ChessComError  # noqa: E402
+from rate_limit import AdaptiveConcurrency, TokenBucket, retry_after_seconds  # noqa: E402
+
+
+def check(cond: bool, message: str) -> None:
+    if not cond:
+        raise AssertionError(message)
+
+
+# --- json_stream ---
+
+def check_json_stream() -> None:
+    doc = {
+        "meta": {"skip": [1, {"tricky": "}], \"quoted\" [", "n": -0.5}], "empty": {}},
+        "games": [
+            {"pgn": "1. e4 {ñandú é} 1-0", "esc": "a\\\"b\né\U0001F600", "n": -12.5e3},
+            123456789,
+            "texto",
+            [],
+            {},
+            None,
+            True,
+            [[1, 2], {"x": [3]}],
+        ],
+        "tail": 7,
+    }
+    expected = doc["games"]
+    for text in (json.dumps(doc, ensure_ascii=False), json.dumps(doc, indent=2)):
+        raw = text.encode("utf-8")
+        for chunk_size in range(1, 48):
+            got = list(iter_array_items(io.BytesIO(raw), "games", chunk_size))
+            check(got == expected, f"iter_array_items con bloques de {chunk_size}: {got!r}")
+
+    for raw, expected in ((b'{"games": []}', []), (b'{}', []), (b'{"other": [1]}', []), (b' {"games":[5]} ', [5])):
+        for chunk_size in (1, 2, 64):
+            got = list(iter_array_items(io.BytesIO(raw), "games", chunk_size))
+            check(got == expected, f"iter_array_items({raw!r}): {got!r}")
+
+    raw = json.dumps(doc).encode("utf-8")
+    for cut in (len(raw) // 3, len(raw) // 2, len(raw) - 3):
+        try:
+            list(iter_array_items(io.BytesIO(raw[:cut]), "games", 7))
+        except ValueError:
+            continue
+        raise AssertionError(f"iter_array_items no detectó el JSON truncado en {cut}")
+
+
+# --- rate_limit ---
+
+def check_adaptive_concurrency() -> None:
+    ac = AdaptiveConcurrency(8, cooldown=0)
+    ac.on_throttle()
+    check(ac.limit == 4, f"tras un 429 el tope debería ser 4: {ac.limit}")
+    for _ in range(5):
+        ac.on_throttle()
+    check(ac.limit == ac.minimum == 1, f"el tope no baja del mínimo: {ac.limit}")
+
+    # Con el tope en 1, una segunda petición espera (y se puede abortar)
+    check(ac.acquire(), "debería obtener el único hueco")
+    abort = threading.Event()
+    abort.set()
+    check(not ac.acquire(abort), "sin huecos, acquire debería respetar 'abort'")
+    ac.release()
+
+    successes = 0
+    while ac.limit < ac.maximum and successes < 1000:
+        ac.on_success()
+        successes += 1
+        check(ac.limit <= ac.maximum, "el tope no supera el máximo")
+    check(ac.limit == ac.maximum, f"el tope no se recuperó tras {successes} respuestas: {ac.limit}")
+    check(successes < 100, f"recuperación demasiado lenta: {successes} respuestas")
+
+    # Una ráfaga de errores dentro del cooldown solo cuenta una vez
+    ac = AdaptiveConcurrency(8, cooldown=60)
+    for _ in range(10):
+        ac.on_throttle()
+    check(ac.limit == 4, f"dentro del cooldown solo se reduce una vez: {ac.limit}")
+
+
+def check_token_bucket() -> None:
+    bucket = TokenBucket(rate=1000, burst=4)
+    t0 = time.monotonic()
+    bucket.pause_until(t0 + 0.3)
+    check(bucket.acquire(), "acquire debería terminar tras la pausa")
+    check(time.monotonic() - t0 >= 0.29, "pause_until debería detener a todos hasta el plazo")
+
+    bucket.pause_until(time.monotonic() + 60)
+    abort = threading.Event()
+    threading.Timer(0.1, abort.set).start()
+    t0 = time.monotonic()
+    check(not bucket.acquire(abort), "acquire debería devolver False al abortar")
+    check(time.monotonic() - t0 < 5, "abortar no debería esperar a que termine la pausa")
+
+
+def check_retry_after() -> None:
+    check(retry_after_seconds("120") == 120, "Retry-After en segundos")
+    when = retry_after_seconds(formatdate(time.time() + 90, usegmt=True))
+    check(when is not None and 85 <= when <= 91, f"Retry-After como fecha HTTP: {when}")
+    check(retry_after_seconds(formatdate(time.time() - 90, usegmt=True)) == 0, "fecha pasada -> 0")
+    check(retry_after_seconds("pronto") is None and retry_after_seconds(None) is None, "Retry-After inválido")
+
+
+# --- Reintentos del cliente ---
+
+class _ScriptedHandler(BaseHTTPRequestHandler):
+    """
+    Responde a cada ruta con la siguiente respuesta de su guion (la última se repite).
+    """
+    scripts: dict[str, list[tuple[int, dict, bytes]]] = {}
+    hits: dict[str, int] = {}
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        script = self.scripts.get(self.path, [(404, {}, b"")])
+        n = self.hits.get(self.path, 0)
+        self.hits[self.path] = n + 1
+        status, headers, body = script[min(n, len(script) - 1)]
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def check_client_retries() -> None:
+    games = json.dumps({"games": [{"uuid": "a"}, {"uuid": "b"}]}).encode()
+    scripts = {
+        "/throttled/2024/01": [(429, {"Retry-After": "1"}, b""), (200, {}, games)],
+        "/broken/2024/01": [(500, {}, b"")],
+        "/missing/2024/01": [(404, {}, b"")],
+        "/closed/2024/01": [(429, {"Retry-After": "3600"}, b"")],
+        "/blocked/2024/01": [(403, {}, b"")],
+    }
+    handler = type("Handler", (_ScriptedHandler,), {"scripts": scripts, "hits": {}})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with ChessComClient(max_workers=4, use_cache=False, rate=0, max_retries=2) as client:
+            # Con el tope del backoff por debajo de Retry-After: se espera lo que pide el servidor
+            backoff_max, OnlineChessAPI.HTTP_BACKOFF_MAX = OnlineChessAPI.HTTP_BACKOFF_MAX, 0.2
+            t0 = time.monotonic()
+            try:
+                with client.open_month(f"{base}/throttled/2024/01") as fp:
+                    got = list(iter_array_items(fp, "games"))
+            finally:
+                OnlineChessAPI.HTTP_BACKOFF_MAX = backoff_max
+            check(got == [{"uuid": "a"}, {"uuid": "b"}], f"cuerpo tras el reintento: {got!r}")
+            check(handler.hits["/throttled/2024/01"] == 2, "un 429 se reintenta una vez")
+            check(time.monotonic() - t0 >= 0.95, "el reintento debería respetar Retry-After")
+            check(client.concurrency.limit < client.max_workers, "un 429 debería reducir la concurrencia")
+
+            try:
+                client.open_month(f"{base}/broken/2024/01").close()
+                raise AssertionError("un 500 persistente debería fallar")
+            except requests.HTTPError:
+                pass
+            check(handler.hits["/broken/2024/01"] == 3, f"500: 1 intento + 2 reintentos, no {handler.hits}")
+
+            try:
+                client.open_month(f"{base}/missing/2024/01").close()
+                raise AssertionError("un 404 debería fallar")
+            except requests.HTTPError:
+                pass
+            check(handler.hits["/missing/2024/01"] == 1, "un 404 no se reintenta")
+
+            t0 = time.monotonic()
+            try:
+                client.open_month(f"{base}/closed/2024/01").close()
+                raise AssertionError("un Retry-After mayor que el máximo debería fallar")
+            except ChessComError as e:
+                check(e.status_code == 429 and "3600" in str(e), f"error de Retry-After poco claro: {e}")
+            check(handler.hits["/closed/2024/01"] == 1, "con un Retry-After excesivo no se reintenta")
+            check(time.monotonic() - t0 < 5, "con un Retry-After excesivo se falla sin esperar")
+
+            try:
+                client.open_month(f"{base}/blocked/2024/01").close()
+                raise AssertionError("un 403 persistente debería fallar")
+            except ChessComError as e:
+                check(e.status_code == 403, f"403: {e}")
+            check(handler.hits["/blocked/2024/01"] == 2, f"un 403 se reintenta una sola vez, no {handler.hits}")
+    finally:
+        server.shutdown()
+
+
+CHECKS = (
+    ("json_stream.iter_array_items", check_json_stream),
+    ("rate_limit.AdaptiveConcurrency", check_adaptive_concurrency),
+    ("rate_limit.TokenBucket", check_token_bucket),
+    ("rate_limit.retry_after_seconds", check_retry_after),
+    ("ChessComClient reintentos", check_client_retries),
+)
+
+
+def main(argv: list[str] | None = None) -> int:
+    failed = 0
+    for name, fn in CHECKS:
+        t0 = time.perf_counter()
+        try:
+            fn()
+        except Exception as e: # una aserción o un error inesperado del código comprobado
+            failed += 1
+            print(f"[FALLO] {name}: {type(e).__name__}: {e}")
+        else:
+            print(f"[OK] {name} ({time.perf_counter() - t0:.2f} s)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""
+Línea de comandos sin interfaz gráfica (no necesita display; apta para cron).
+
+Ejemplos:
+    python chess_cli.py sync hikaru magnuscarlsen
+    python chess_cli.py sync --file club.txt --workers 8 --full-history
+    python chess_cli.py -v sync hikaru          # log de cada fase (CHESS_LOG_LEVEL=DEBUG)
+    python chess_cli.py rebuild                 # regenera los registros desde el almacén local, sin red
+    python chess_cli.py export partidas.csv.gz  # copia de seguridad (CSV o JSONL, .gz opcional)
+    python chess_cli.py import partidas.csv.gz  # importa omitiendo las partidas que ya existen
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+from config import HTTP_MAX_WORKERS, HTTP_RATE_PER_S, LOG_LEVEL, MONTHS_TO_FETCH
+import metrics
+
+# Cuentas sincronizadas en paralelo por defecto
+DEFAULT_ACCOUNT_WORKERS = 4
+
+
+@dataclass
+class AccountResult:
+    """
+    Resultado de sincronizar una cuenta (para el resumen por consola).
+    """
+    username: str
+    seconds: float
+    stats: object = None # SyncStats si terminó bien
+    error: str | None = None
+    timings: metrics.Metrics | None = None # tiempos por fase y contadores HTTP/BD
+
+
+def read_usernames(args_usernames: list[str], path: str | None) -> list[str]:
+    """
+    Une los usernames de la línea de comandos y del archivo (uno por línea, '#' = comentario),
+    sin repetidos y respetando el orden.
+    """
+    names = list(args_usernames)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    names.append(line)
+    seen = set()
+    unique = []
+    for name in names:
+        if name.lower() not in seen:
+            seen.add(name.lower())
+            unique.append(name)
+    return unique
+
+
+def sync_account(client, username: str, months: int | None, store=None, enricher=None) -> AccountResult:
+    """
+    Sincroniza una cuenta en su propia sesión, con un commit por mes: las cuentas en paralelo
+    no se esperan unas a otras por el resumen compartido (el pool de conexiones del engine
+    y el de procesos que analizan los PGN son compartidos entre hilos).
+    Nunca lanza: los errores se devuelven en el resultado.
+    """
+    from chess_sync import sync_player
+    from models import session_scope
+
+    t0 = time.perf_counter()
+    with metrics.collect(f"sync {username}") as m:
+        try:
+            with session_scope() as session:
+                stats = sync_player(session, client, username, months, store=store, enricher=enricher,
+                                    commit_months=True)
+            return AccountResult(username, time.perf_counter() - t0, stats=stats, timings=m)
+        except Exception as e:
+            return AccountResult(username, time.perf_counter() - t0, error=str(e) or type(e).__name__, timings=m)
+
+
+def cmd_sync(args) -> int:
+    from game_store import default_store
+    from OnlineChessAPI import ChessComClient
+    from pgn_enrich import PgnEnricher
+
+    usernames = read_usernames(args.usernames, args.file)
+    if not usernames:
+        print("No se indicó ningún username (argumentos o --file).", file=sys.stderr)
+        return 2
+    months = None if args.full_history else args.months
+    store = default_store()
+
+    t0 = time.perf_counter()
+    results = []
+    # Un solo cliente HTTP para todas las cuentas: su pool limita la concurrencia total hacia Chess.com.
+    # Igual con el analizador de PGN: un proceso por núcleo para todas las cuentas, no por cuenta
+    with ChessComClient(max_workers=args.http_workers, rate=args.rate) as client, PgnEnricher() as enricher:
+        with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="account") as pool:
+            futures = [pool.submit(sync_account, client, u, months, store, enricher) for u in usernames]
+            for fut in as_completed(futures):
+                res = fut.result()
+                results.append(res)
+                if res.error:
+                    print(f"[ERROR] {res.username}: {res.error} ({res.seconds:.1f} s)")
+                else:
+                    st = res.stats
+                    print(f"[OK] {res.username}: meses={st.months} escaneadas={st.scanned} "
+                          f"insertadas={st.inserted} ({res.seconds:.1f} s)")
+
+    ok = [r for r in results if not r.error]
+    print("-" * 60)
+    print(f"Cuentas: {len(results)} (ok {len(ok)}, con error {len(results) - len(ok)})")
+    print(f"Escaneadas: {sum(r.stats.scanned for r in ok)} | Insertadas: {sum(r.stats.inserted for r in ok)}")
+    print(f"Tiempo total: {time.perf_counter() - t0:.1f} s")
+    if args.metrics:
+        # Suma de todas las cuentas (las fases de cuentas en paralelo se solapan en el tiempo)
+        total = metrics.Metrics("sync")
+        for r in results:
+            total.merge(r.timings)
+        print("Fases (suma de todas las cuentas):")
+        print("\n".join(total.summary_lines()[1:]))
+    return 0 if len(ok) == len(results) else 1
+
+
+def cmd_rebuild(args) -> int:
+    from chess_sync import rebuild_from_store
+    from game_store import default_store
+    from models import session_scope
+
+    store = default_store()
+    if store is None:
+        print("El almacén local está desactivado (CHESS_GAME_STORE_DIR vacío).", file=sys.stderr)
+        return 2
+    usernames = read_usernames(args.usernames, None) or None
+
+    # Una sola transacción: si algo falla, los registros quedan como estaban
+    with metrics.collect("rebuild") as m:
+        try:
+            with session_scope() as session:
+                stats = rebuild_from_store(session, store, usernames)
+        except Exception as e:
+            print(f"[ERROR] {e}", file=sys.stderr)
+            return 1
+    print(f"Meses: {stats.months} | Escaneadas: {stats.scanned} | Insertadas: {stats.inserted} "
+          f"| Empates: {stats.draws}")
+    print(f"Almacén: {store.directory} ({store.size_bytes() / (1024 * 1024):.1f} MB)")
+    print(f"Tiempo total: {m.elapsed:.1f} s")
+    if args.metrics:
+        print("Fases:")
+        print("\n".join(m.summary_lines()[1:]))
+    return 0
+
+
+def _records_format(args) -> str:
+    from records_io import detect_format
+    return args.format or detect_format(args.path)
+
+
+def cmd_export(args) -> int:
+    from models import session_scope
+    from records_io import export_records, open_records_file
+
+    try:
+        fmt = _records_format(args)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    with metrics.collect("export") as m, session_scope(commit=False) as session, open_records_file(args.path, "w") as fp:
+        total = export_records(session, fp, fmt)
+    # Con '-' los datos van a stdout: el resumen va a stderr
+    out = sys.stderr if args.path == "-" else sys.stdout
+    print(f"Exportadas: {total} partidas ({fmt}) en {m.elapsed:.1f} s", file=out)
+    return 0
+
+
+def cmd_import(args) -> int:
+    from models import session_scope
+    from records_io import import_records, open_records_file
+
+    try:
+        fmt = _records_format(args)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    # Una sola transacción: si el archivo tiene un error, no se importa nada
+    with metrics.collect("import") as m, open_records_file(args.path, "r") as fp:
+        try:
+            with session_scope() as session:
+                stats = import_records(session, fp, fmt)
+        except Exception as e:
+            print(f"[ERROR] {e}", file=sys.stderr)
+            return 1
+    print(f"Leídas: {stats.read} | Insertadas: {stats.inserted} | Ya existían: {stats.duplicates}")
+    print(f"Tiempo total: {m.elapsed:.1f} s")
+    if args.metrics:
+        print("Fases:")
+        print("\n".join(m.summary_lines()[1:]))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Registro de partidas de Chess.com (modo consola)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log detallado (fases y sentencias SQL)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("sync", help="Sincroniza una o varias cuentas de Chess.com")
+    p.add_argument("usernames", nargs="*", help="Usernames de Chess.com")
+    p.add_argument("-f", "--file", help="Archivo con un username por línea")
+    p.add_argument("-w", "--workers", type=int, default=DEFAULT_ACCOUNT_WORKERS,
+                   help=f"Cuentas en paralelo (por defecto {DEFAULT_ACCOUNT_WORKERS})")
+    p.add_argument("--http-workers", type=int, default=HTTP_MAX_WORKERS,
+                   help=f"Conexiones simultáneas a Chess.com (por defecto {HTTP_MAX_WORKERS})")
+    p.add_argument("--rate", type=float, default=HTTP_RATE_PER_S,
+                   help=f"Peticiones por segundo a Chess.com, 0 = sin límite (por defecto {HTTP_RATE_PER_S:g})")
+    p.add_argument("--months", type=int, default=MONTHS_TO_FETCH,
+                   help="Meses a descargar si la cuenta no tiene marca de agua")
+    p.add_argument("--full-history", action="store_true", help="Descargar todo el historial")
+    p.add_argument("--no-metrics", dest="metrics", action="store_false",
+                   help="No mostrar el resumen de tiempos por fase / HTTP / BD")
+    p.set_defaults(func=cmd_sync)
+
+    p = sub.add_parser("rebuild", help="Regenera los registros desde el almacén local de partidas (sin red)")
+    p.add_argument("usernames", nargs="*", help="Cuentas a regenerar (por defecto todas las del almacén)")
+    p.add_argument("--no-metrics", dest="metrics", action="store_false",
+                   help="No mostrar el resumen de tiempos por fase / BD")
+    p.set_defaults(func=cmd_rebuild)
+
+    for name, func, help_text in (
+        ("export", cmd_export, "Exporta todas las partidas a CSV / JSONL ('-' = stdout)"),
+        ("import", cmd_import, "Importa partidas de CSV / JSONL omitiendo las que ya existen ('-' = stdin)"),
+    ):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("path", help="Archivo .csv / .jsonl (opcionalmente .gz)")
+        p.add_argument("--format", choices=("csv", "jsonl"), help="Formato (por defecto, según la extensión)")
+        if name == "import":
+            p.add_argument("--no-metrics", dest="metrics", action="store_false",
+                           help="No mostrar el resumen de tiempos por fase / BD")
+        p.set_defaults(func=func)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    metrics.configure_logging(level="DEBUG" if args.verbose else LOG_LEVEL)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
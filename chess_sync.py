@@ -0,0 +1,303 @@
+import datetime as dt
+import logging
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import closing, nullcontext
+from dataclasses import dataclass, replace
+from itertools import islice
+
+from sqlalchemy import delete, insert
+
+from game_store import GameStore
+from models import (
+    INSERT_BATCH_SIZE, ChessRecord, SyncState, bulk_insert_records, claim_legacy_records, existing_game_uuids,
+    legacy_record_ids, rebuild_stats
+)
+from OnlineChessAPI import (
+    OUTCOME_DRAW, OUTCOME_LABELS, OUTCOME_LOSS, OUTCOME_WIN, ChessComClient, GameColumns, archive_month, classify_games
+)
+from pgn_enrich import PgnEnricher
+import metrics
+
+log = logging.getLogger(__name__)
+
+
+class SyncCancelled(Exception):
+    """
+    La sincronización se canceló a petición del usuario (quien llama debe hacer rollback).
+    """
+
+
+@dataclass
+class SyncStats:
+    """
+    Contadores de una sincronización (para el resumen en la UI / consola).
+    """
+    archives: int = 0   # meses disponibles en Chess.com
+    months_total: int = 0  # meses a procesar en esta sincronización
+    months: int = 0     # meses procesados
+    scanned: int = 0
+    skipped: int = 0    # partidas anteriores a la marca de agua (ya sincronizadas)
+    wins: int = 0
+    losses: int = 0
+    draws: int = 0
+    inserted: int = 0
+
+    def summary_lines(self) -> list[str]:
+        return [
+            f"Escaneadas: {self.scanned}",
+            f"Omitidas (ya sincronizadas): {self.skipped}",
+            f"Wins detectadas: {self.wins}",
+            f"Losses detectadas: {self.losses}",
+            f"Empates detectados: {self.draws}",
+            f"Nuevos insertados: {self.inserted}",
+        ]
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    """
+    Agrupa un iterable en listas de hasta 'size' elementos (sin materializarlo entero).
+    """
+    it = iter(items)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def rows_for_player(cols: GameColumns, username: str, stats: SyncStats, since_ts: int = 0) -> list[dict]:
+    """
+    Convierte un lote ya clasificado (classify_games) en filas para 'chess_records'
+    (solo Ganada/Perdida) y actualiza los contadores de 'stats'.
+    Las partidas que terminaron antes de 'since_ts' (marca de agua) se omiten.
+    Los datos del PGN (eco, opening, moves) los agrega después PgnEnricher, solo a las nuevas.
+    """
+    username = username.lower()
+    rows = []
+    for outcome, opponent, end_time, end_date, game_uuid, rating, opponent_rating, time_class in zip(
+        cols.outcome, cols.opponent, cols.end_time, cols.end_date, cols.game_uuid,
+        cols.rating, cols.opponent_rating, cols.time_class,
+    ):
+        if end_time < since_ts:
+            stats.skipped += 1
+            continue
+        stats.scanned += 1 # Cuenta las partidas escaneadas
+
+        # Contadores de resultados detectados (no insertados)
+        if outcome == OUTCOME_WIN:
+            stats.wins += 1
+        elif outcome == OUTCOME_LOSS:
+            stats.losses += 1
+        else:
+            if outcome == OUTCOME_DRAW:
+                stats.draws += 1
+            continue # Los empates/otros estados no se guardan
+
+        rows.append({
+            "opponent": opponent,
+            "result": OUTCOME_LABELS[outcome],
+            "date": end_date,
+            # Clave natural: uuid de la partida (o su URL en archivos antiguos)
+            "game_uuid": game_uuid,
+            "username": username,
+            "time_class": time_class,
+            "rating": rating,
+            "opponent_rating": opponent_rating,
+        })
+    return rows
+
+
+def dedup_rows(session, rows: list[dict]) -> list[dict]:
+    """
+    Devuelve las filas que aún no existen en la BD:
+    - Por clave natural (username, game_uuid): una sonda al índice único por lote
+      ('rows' son de una sola cuenta)
+    - Registros antiguos sin game_uuid con la misma (opponent, result, date) se consideran
+      la misma partida y se "reclaman" (se les asigna el game_uuid) en vez de duplicarlos
+    """
+    if not rows:
+        return rows
+    known = existing_game_uuids(session, rows[0]["username"], (row["game_uuid"] for row in rows))
+    rows = [row for row in rows if row["game_uuid"] not in known]
+    if not rows:
+        return rows
+
+    legacy = legacy_record_ids(session, {row["date"] for row in rows})
+    if not legacy:
+        return rows
+    new_rows, claims = [], []
+    for row in rows:
+        ids = legacy.get((row["opponent"], row["result"], row["date"]))
+        if ids:
+            claims.append({"id": ids.pop(0), "game_uuid": row["game_uuid"], "username": row["username"]})
+        else:
+            new_rows.append(row)
+    claim_legacy_records(session, [c for c in claims if c["game_uuid"]])
+    return new_rows
+
+
+def sync_player(session, client: ChessComClient, username: str, months: int | None,
+                progress: Callable[[SyncStats], None] | None = None,
+                cancel: threading.Event | None = None, store: GameStore | None = None,
+                enricher: PgnEnricher | None = None, commit_months: bool = False) -> SyncStats:
+    """
+    Descarga las partidas de 'username' y agrega a la sesión las que no existan.
+    - Si la cuenta ya tiene marca de agua (SyncState), solo se descargan los archivos
+      desde el último mes procesado y se omiten las partidas anteriores a ella.
+    - Si no, months=N -> solo los últimos N archivos mensuales.
+    - months=None -> historial completo (ignora la marca de agua; descarga concurrente).
+    Actualiza la marca de agua en la misma transacción. No hace commit (salvo commit_months):
+    la transacción la controla quien llama.
+    - progress: se llama con una copia de los contadores tras cada lote procesado
+    - cancel: si se activa, se detiene en el siguiente lote lanzando SyncCancelled
+    - store: si se indica, las partidas descargadas se guardan también en bruto (ver game_store.py)
+    - enricher: analizador de PGN compartido (p.ej. entre cuentas); si no, se usa uno propio
+    - commit_months: commit tras cada mes (con su marca de agua). Para varias cuentas en
+      paralelo: los grupos compartidos de 'record_stats' (y en SQLite, la escritura) quedan
+      bloqueados solo durante un mes, no durante toda la cuenta. Un fallo conserva los meses
+      ya guardados, y la próxima sincronización sigue desde ellos.
+    Puede lanzar ChessComError / requests.RequestException / SyncCancelled.
+    """
+    stats = SyncStats()
+
+    def checkpoint() -> None:
+        if cancel is not None and cancel.is_set():
+            raise SyncCancelled()
+        if progress is not None:
+            progress(replace(stats))
+
+    # 1) Obtener Lista de archivos mensuales
+    with metrics.phase("archives"):
+        archives = client.get_archives(username)
+    stats.archives = len(archives)
+    log.info("%s: %d archivos mensuales", username, len(archives))
+    if not archives:
+        return stats
+
+    state = session.get(SyncState, username.lower())
+    if state is None:
+        state = SyncState(username=username.lower())
+        session.add(state)
+
+    since_ts = 0
+    if months is None:
+        month_urls = archives
+    elif state.last_archive:
+        # Incremental: el último mes procesado puede tener partidas nuevas
+        month_urls = [u for u in archives if archive_month(u) >= state.last_archive]
+        since_ts = state.last_end_time or 0
+    else:
+        month_urls = archives[-months:]
+    stats.months_total = len(month_urls)
+    log.info("%s: procesando %d meses", username, len(month_urls))
+    checkpoint()
+
+    # 2) Recorre cada mes (descargados en paralelo, entregados en orden).
+    #    Las partidas llegan en streaming y se procesan en lotes de INSERT_BATCH_SIZE,
+    #    así la memoria no depende del tamaño del mes.
+    with closing(client.iter_month_games(month_urls)) as months_iter, \
+            (nullcontext(enricher) if enricher is not None else PgnEnricher()) as enricher:
+        for month_url, games in months_iter:
+            sync_month(session, username, month_url, games, state, since_ts, stats, checkpoint, store, enricher)
+            if commit_months:
+                with metrics.phase("commit"):
+                    session.commit()
+
+    return stats
+
+
+def sync_month(session, username: str, month_url: str, games: Iterable[dict], state: SyncState,
+               since_ts: int, stats: SyncStats, checkpoint: Callable[[], None],
+               store: GameStore | None = None, enricher: PgnEnricher | None = None) -> None:
+    """
+    Procesa un archivo mensual (partidas en streaming) por lotes y avanza la marca de agua.
+    Con 'store', cada lote se guarda también en bruto (todas las partidas, no solo las nuevas).
+    Con 'enricher', las filas nuevas llevan los datos de su PGN (apertura, jugadas).
+    """
+    stats.months += 1
+    month_scanned = stats.scanned
+    last_ts = 0
+    writer = store.writer(username, archive_month(month_url)) if store is not None else None
+    # El parseo es perezoso (streaming): se mide el tiempo de producir cada partida
+    for batch in batched(metrics.timed_iter(games, "parse"), INSERT_BATCH_SIZE):
+        if writer is not None:
+            with metrics.phase("store"):
+                writer.add(batch)
+        with metrics.phase("classify"):
+            # Un solo paso por lote: resultado, oponente, fecha... en columnas
+            cols = classify_games(batch, username)
+            last_ts = max(last_ts, max(cols.end_time, default=0))
+            rows = rows_for_player(cols, username, stats, since_ts)
+
+        # Evitar duplicados: sonda por (username, game_uuid) (índice único), una consulta por lote
+        with metrics.phase("dedup"):
+            rows = dedup_rows(session, rows)
+        if enricher is not None and rows:
+            with metrics.phase("enrich"):
+                enricher.enrich(session, rows, batch)
+        with metrics.phase("insert"):
+            stats.inserted += bulk_insert_records(session, rows)
+        checkpoint()
+    log.debug("Partidas en %s: %d", month_url, stats.scanned - month_scanned)
+
+    # Avanzar la marca de agua
+    state.last_end_time = max(state.last_end_time or 0, last_ts)
+    state.last_archive = max(state.last_archive or "", archive_month(month_url))
+    checkpoint()
+
+
+def _month_range(month: str) -> tuple[dt.date, dt.date]:
+    """
+    'YYYY/MM' -> (primer día del mes, primer día del mes siguiente).
+    """
+    year, mon = map(int, month.split("/"))
+    start = dt.date(year, mon, 1)
+    return start, (dt.date(year + 1, 1, 1) if mon == 12 else dt.date(year, mon + 1, 1))
+
+
+def rebuild_from_store(session, store: GameStore, usernames: Iterable[str] | None = None,
+                       progress: Callable[[SyncStats], None] | None = None,
+                       enricher: PgnEnricher | None = None) -> SyncStats:
+    """
+    Reconstruye 'chess_records' desde el almacén local, sin red (p.ej. tras cambiar la
+    clasificación). Para cada cuenta (por defecto todas las del almacén) y cada mes guardado,
+    borra sus registros sincronizados y los vuelve a generar desde las partidas en
+    bruto. Los meses que no están en el almacén y los registros manuales no se tocan.
+    Los datos del PGN salen de la caché 'pgn_cache' (solo se analizan los PGN nuevos).
+    Recalcula 'record_stats' al final. No hace commit.
+    """
+    stats = SyncStats()
+    with nullcontext(enricher) if enricher is not None else PgnEnricher() as enricher:
+        for username in (usernames if usernames is not None else store.usernames()):
+            username = username.lower()
+            months = store.months(username)
+            stats.months_total += len(months)
+            # Primero se borran todos los meses y después se reinserta: así una partida con fecha
+            # en el borde de un mes nunca la borra el mes siguiente
+            with metrics.phase("delete"):
+                for month in months:
+                    start, end = _month_range(month)
+                    session.execute(
+                        delete(ChessRecord)
+                        .where(ChessRecord.username == username, ChessRecord.date >= start, ChessRecord.date < end)
+                    )
+            for month in months:
+                for batch in batched(metrics.timed_iter(store.iter_games(username, month), "parse"), INSERT_BATCH_SIZE):
+                    with metrics.phase("classify"):
+                        rows = rows_for_player(classify_games(batch, username), username, stats)
+                    with metrics.phase("dedup"):
+                        rows = dedup_rows(session, rows)
+                    if rows:
+                        with metrics.phase("enrich"):
+                            enricher.enrich(session, rows, batch)
+                    with metrics.phase("insert"):
+                        # El resumen se recalcula entero al final: insertar sin actualizarlo fila a fila
+                        for i in range(0, len(rows), INSERT_BATCH_SIZE):
+                            session.execute(insert(ChessRecord), rows[i:i + INSERT_BATCH_SIZE])
+                        stats.inserted += len(rows)
+                stats.months += 1
+                if progress is not None:
+                    progress(replace(stats))
+            log.info("%s: %d meses reconstruidos desde el almacén", username, len(months))
+
+    with metrics.phase("stats"):
+        rebuild_stats(session)
+    return stats
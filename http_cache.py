@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections.abc import Iterable
+from datetime import datetime, timezone
+from typing import BinaryIO
+
+from config import HTTP_CACHE_DIR, HTTP_CACHE_MAX_BYTES
+
+
+class CacheEntry:
+    """
+    Metadatos de una respuesta guardada en disco (el cuerpo va en un archivo aparte).
+    """
+    __slots__ = ("url", "etag", "last_modified", "stored_at", "immutable", "body_path")
+
+    def __init__(self, url, etag, last_modified, stored_at, immutable, body_path):
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+        self.immutable = immutable
+        self.body_path = body_path
+
+    def validators(self) -> dict:
+        """
+        Cabeceras para una petición condicional (revalidación).
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def month_closed_before(month: str, ts: float) -> bool:
+    """
+    True si el mes 'YYYY/MM' ya había terminado (UTC) en el instante 'ts'.
+    Un archivo mensual descargado después de cerrar su mes no vuelve a cambiar.
+    """
+    year, mon = (int(x) for x in month.split("/"))
+    year, mon = (year + 1, 1) if mon == 12 else (year, mon + 1)
+    return ts >= datetime(year, mon, 1, tzinfo=timezone.utc).timestamp()
+
+
+class ResponseCache:
+    """
+    Caché en disco de respuestas HTTP indexada por URL.
+    - Guarda ETag / Last-Modified para revalidar con If-None-Match / If-Modified-Since
+    - Las entradas marcadas como inmutables (meses cerrados) no se revalidan nunca
+    - Tamaño acotado: al superar max_bytes se expulsan las menos usadas (LRU por mtime)
+    Es seguro usarla desde varios hilos de descarga a la vez.
+    """
+
+    def __init__(self, directory: str = HTTP_CACHE_DIR, max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._total = sum(
+            os.path.getsize(os.path.join(directory, f))
+            for f in os.listdir(directory) if f.endswith(".body")
+        )
+
+    def _paths(self, url: str) -> tuple[str, str]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + ".body", base + ".json"
+
+    def lookup(self, url: str) -> CacheEntry | None:
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url or not os.path.exists(body_path):
+            return None
+        return CacheEntry(url, meta.get("etag"), meta.get("last_modified"),
+                          meta.get("stored_at", 0), meta.get("immutable", False), body_path)
+
+    def open(self, entry: CacheEntry) -> BinaryIO:
+        """
+        Abre el cuerpo guardado (binario) y marca la entrada como usada recientemente.
+        """
+        self.touch(entry)
+        return open(entry.body_path, "rb")
+
+    def touch(self, entry: CacheEntry) -> None:
+        try:
+            os.utime(entry.body_path)
+        except OSError:
+            pass
+
+    def store(self, url: str, chunks: Iterable[bytes], headers, immutable: bool = False) -> BinaryIO:
+        """
+        Guarda (o reemplaza) la respuesta de 'url' escribiéndola bloque a bloque,
+        sin tenerla entera en memoria. Escritura atómica: archivo temporal + rename.
+        Devuelve el cuerpo abierto y posicionado al inicio para leerlo a continuación.
+        """
+        body_path, meta_path = self._paths(url)
+        tmp = f"{body_path}.{threading.get_ident()}.tmp"
+        size = 0
+        try:
+            with open(tmp, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "stored_at": time.time(),
+            "immutable": immutable,
+        }
+        with self._lock:
+            old_size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+            os.replace(tmp, body_path)
+            tmp = f"{meta_path}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as mf:
+                json.dump(meta, mf)
+            os.replace(tmp, meta_path)
+            self._total += size - old_size
+            if self._total > self.max_bytes:
+                self._evict(keep=body_path)
+            # Se reabre dentro del lock para que otra expulsión no lo borre antes
+            return open(body_path, "rb")
+
+    def _evict(self, keep: str) -> None:
+        """
+        Borra las entradas menos usadas hasta volver a quedar bajo max_bytes.
+        (Se llama con el lock tomado.)
+        """
+        bodies = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".body"):
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                bodies.append((st.st_mtime, st.st_size, path))
+        bodies.sort()
+        for _, size, path in bodies:
+            if self._total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue # en uso (p.ej. abierto en Windows): se intentará en otra pasada
+            self._total -= size
+            try:
+                os.remove(path[:-len(".body")] + ".json")
+            except OSError:
+                pass
+
+
+def default_cache() -> ResponseCache | None:
+    """
+    Caché configurada en config.py (None si CHESS_HTTP_CACHE_DIR está vacío).
+    """
+    return ResponseCache() if HTTP_CACHE_DIR else None
@@ -0,0 +1,117 @@
+import codecs
+import json
+import re
+from collections.abc import Iterator
+from typing import BinaryIO
+
+# Caracteres que JSON considera espacio en blanco
+_WHITESPACE = " \t\n\r"
+_NUMBER_START = "-0123456789"
+_NUMBER_END = re.compile(r"[,\]}\s]")
+
+READ_CHUNK = 64 * 1024
+
+
+class _JsonReader:
+    """
+    Lector incremental sobre un archivo binario UTF-8: mantiene solo un buffer
+    pequeño y decodifica valores completos con json.JSONDecoder.raw_decode.
+    """
+
+    def __init__(self, fp: BinaryIO, chunk_size: int = READ_CHUNK):
+        self._text = codecs.getreader("utf-8")(fp)
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        """
+        Lee el siguiente bloque (descartando lo ya consumido). False si no hay más datos.
+        """
+        if self.eof:
+            return False
+        chunk = self._text.read(self._chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def skip_ws(self) -> None:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return
+
+    def next_char(self) -> str:
+        self.skip_ws()
+        if self.pos >= len(self.buf):
+            raise ValueError("JSON incompleto")
+        ch = self.buf[self.pos]
+        self.pos += 1
+        return ch
+
+    def peek_char(self) -> str:
+        self.skip_ws()
+        return self.buf[self.pos] if self.pos < len(self.buf) else ""
+
+    def value(self):
+        """
+        Decodifica el siguiente valor completo, leyendo más bloques si hace falta.
+        """
+        self.skip_ws()
+        if self.pos < len(self.buf) and self.buf[self.pos] in _NUMBER_START:
+            # Un número podría estar cortado al final del buffer: leer hasta ver su delimitador
+            while _NUMBER_END.search(self.buf, self.pos) is None and self._fill():
+                pass
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            self.pos = end
+            return obj
+
+
+def iter_array_items(fp: BinaryIO, key: str, chunk_size: int = READ_CHUNK) -> Iterator:
+    """
+    Recorre en streaming el array 'key' de un objeto JSON de primer nivel
+    (p.ej. {"games": [...]}) entregando un elemento a la vez.
+    La memoria usada queda acotada por el elemento más grande + un bloque de lectura
+    de 'chunk_size' caracteres.
+    """
+    reader = _JsonReader(fp, chunk_size)
+    if reader.next_char() != "{":
+        raise ValueError("Se esperaba un objeto JSON")
+    if reader.peek_char() == "}":
+        return
+    while True:
+        name = reader.value()
+        if reader.next_char() != ":":
+            raise ValueError("Se esperaba ':' en el objeto JSON")
+        if name == key:
+            if reader.next_char() != "[":
+                raise ValueError(f"'{key}' no es un array")
+            if reader.peek_char() == "]":
+                reader.next_char()
+            else:
+                while True:
+                    yield reader.value()
+                    ch = reader.next_char()
+                    if ch == "]":
+                        break
+                    if ch != ",":
+                        raise ValueError("Se esperaba ',' o ']' en el array")
+        else:
+            reader.value() # otra clave: se descarta
+        ch = reader.next_char()
+        if ch == "}":
+            return
+        if ch != ",":
+            raise ValueError("Se esperaba ',' o '}' en el objeto JSON")
@@ -0,0 +1,231 @@
+"""
+Instrumentación: tiempos por fase, contadores HTTP y de BD, y logging.
+
+Una operación (una sincronización, un refresco...) se mide dentro de collect():
+todo lo que se ejecute en ese contexto (incluidos los hilos de descarga lanzados con
+submit_in_context y las consultas de SQLAlchemy) se acumula en su objeto Metrics.
+Fuera de collect() las mediciones solo se emiten como logs de depuración.
+"""
+import contextvars
+import logging
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+
+from config import LOG_FILE, LOG_LEVEL
+
+log = logging.getLogger("gamestatchess")
+sql_log = logging.getLogger("gamestatchess.sql")
+
+# Nombres legibles de las fases (en el orden en que se muestran en el resumen)
+PHASE_LABELS = {
+    "archives": "Lista de archivos",
+    "throttle": "Espera por límite/reintento",
+    "download": "Descarga (por mes)",
+    "download_wait": "Espera de descargas",
+    "parse": "Parseo JSON",
+    "store": "Almacén local",
+    "delete": "Borrado",
+    "classify": "Clasificación",
+    "read": "Lectura del archivo",
+    "dedup": "Deduplicación",
+    "enrich": "Análisis de PGN",
+    "insert": "Inserción",
+    "copy": "COPY (PostgreSQL)",
+    "commit": "Commit",
+    "refresh": "Refresco de tabla",
+    "stats": "Estadísticas",
+}
+
+_current: contextvars.ContextVar["Metrics | None"] = contextvars.ContextVar("metrics", default=None)
+
+
+class Metrics:
+    """
+    Acumuladores de una operación (seguros entre hilos):
+    - phases: fase -> [veces, segundos totales, máximo de una vez]
+    - counters: contadores ('http.requests', 'http.bytes', 'http.status.200', 'http.retries'...)
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self.started = time.perf_counter()
+        self.finished: float | None = None
+        self.phases: dict[str, list] = {}
+        self.counters: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def add_time(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            p = self.phases.setdefault(phase, [0, 0.0, 0.0])
+            p[0] += 1
+            p[1] += seconds
+            p[2] = max(p[2], seconds)
+
+    def incr(self, counter: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] += n
+
+    def merge(self, other: "Metrics") -> None:
+        """
+        Suma las mediciones de 'other' (p.ej. para el resumen de varias cuentas).
+        """
+        with self._lock:
+            for phase, (count, total, peak) in other.phases.items():
+                p = self.phases.setdefault(phase, [0, 0.0, 0.0])
+                p[0] += count
+                p[1] += total
+                p[2] = max(p[2], peak)
+            self.counters.update(other.counters)
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "seconds": round(self.elapsed, 4),
+            "phases": {k: {"count": c, "seconds": round(t, 4), "max_seconds": round(m, 4)}
+                       for k, (c, t, m) in self.phases.items()},
+            "counters": dict(self.counters),
+        }
+
+    def summary_lines(self) -> list[str]:
+        """
+        Resumen para la consola / la UI: una línea por fase y totales de HTTP y BD.
+        """
+        lines = [f"Tiempo total: {self.elapsed:.2f} s"]
+        # 'db' (tiempo en sentencias SQL) se solapa con las demás fases: va en su propia línea
+        order = list(PHASE_LABELS) + sorted(set(self.phases) - set(PHASE_LABELS) - {"db"})
+        for phase in order:
+            if phase not in self.phases:
+                continue
+            count, total, peak = self.phases[phase]
+            label = PHASE_LABELS.get(phase, phase)
+            lines.append(f"  {label:<28} {total:8.3f} s  ({count}x, máx {peak:.3f} s)")
+
+        c = self.counters
+        statuses = ", ".join(f"{k.rsplit('.', 1)[1]}: {v}" for k, v in sorted(c.items()) if k.startswith("http.status."))
+        lines.append(
+            f"HTTP: {c['http.requests']} peticiones, {c['http.bytes'] / (1024 * 1024):.1f} MB"
+            f" [{statuses or '-'}], {c['http.retries']} reintentos, {c['http.cache_hits']} desde caché"
+        )
+        if c["pgn.parsed"] or c["pgn.cache_hits"]:
+            lines.append(f"PGN: {c['pgn.parsed']} analizados, {c['pgn.cache_hits']} desde caché")
+        db_count, db_total, _ = self.phases.get("db", (0, 0.0, 0.0))
+        lines.append(f"BD: {db_count} sentencias, {db_total:.3f} s")
+        return lines
+
+
+def current() -> Metrics | None:
+    return _current.get()
+
+
+@contextmanager
+def collect(name: str = "", metrics: Metrics | None = None) -> Iterator[Metrics]:
+    """
+    Activa un Metrics (nuevo, o 'metrics' para seguir acumulando en uno existente)
+    para todo lo que se ejecute dentro del bloque en este hilo.
+    """
+    m = metrics if metrics is not None else Metrics(name)
+    token = _current.set(m)
+    try:
+        yield m
+    finally:
+        _current.reset(token)
+        if metrics is None:
+            m.finished = time.perf_counter()
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """
+    Mide el bloque como una vez de la fase 'name' en el Metrics activo (si lo hay).
+    """
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - t0
+        m = _current.get()
+        if m is not None:
+            m.add_time(name, seconds)
+        log.debug("fase %s: %.1f ms", name, seconds * 1000)
+
+
+def incr(counter: str, n: int = 1) -> None:
+    m = _current.get()
+    if m is not None:
+        m.incr(counter, n)
+
+
+def timed_iter(items: Iterable, name: str) -> Iterator:
+    """
+    Itera 'items' acumulando en la fase 'name' el tiempo que tarda en producir cada elemento
+    (útil para generadores perezosos, como el parseo en streaming). Cuenta una vez en total.
+    """
+    total = 0.0
+    it = iter(items)
+    try:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                total += time.perf_counter() - t0
+            yield item
+    finally:
+        m = _current.get()
+        if m is not None:
+            m.add_time(name, total)
+
+
+def submit_in_context(executor, fn, *args):
+    """
+    executor.submit que conserva el Metrics activo en el hilo trabajador.
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def install_db_hooks(engine) -> None:
+    """
+    Cuenta y cronometra cada sentencia SQL del engine (fase 'db' del Metrics activo).
+    Con nivel DEBUG en 'gamestatchess.sql' además se registra cada sentencia.
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_t0", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["metrics_t0"].pop()
+        m = _current.get()
+        if m is not None:
+            m.add_time("db", seconds)
+        if sql_log.isEnabledFor(logging.DEBUG):
+            sql_log.debug("%.1f ms%s: %s", seconds * 1000, " (executemany)" if executemany else "",
+                          " ".join(statement.split())[:200])
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("metrics_t0"):
+            conn.info["metrics_t0"].pop()
+
+
+def configure_logging(level: str = LOG_LEVEL, log_file: str = LOG_FILE) -> None:
+    """
+    Logging de la app a stderr (y a 'log_file' si se indica). Solo la primera llamada tiene efecto.
+    """
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding="utf-8"))
+    logging.basicConfig(level=level.upper(), handlers=handlers,
+                        format="%(asctime)s %(levelname)s %(threadName)s %(name)s: %(message)s")
@@ -0,0 +1,165 @@
+"""
+Enriquecimiento de las partidas sincronizadas con datos de su PGN: código ECO, nombre de
+la apertura y número de jugadas.
+
+- parse_pgn / parse_pgns: análisis puro (expresiones regulares, sin dependencias), pensado
+  para ejecutarse en procesos del pool: este módulo no importa SQLAlchemy al cargarse, así
+  los procesos trabajadores arrancan rápido.
+- PgnEnricher: reparte el análisis de cada lote entre un pool de procesos (creado al primer
+  lote grande) y usa la caché 'pgn_cache' de la BD, indexada por el hash del PGN: una partida
+  cuyo PGN no cambió no se vuelve a analizar (p.ej. al reconstruir desde el almacén local,
+  o la misma partida vista desde las dos cuentas que la jugaron).
+"""
+import hashlib
+import logging
+import multiprocessing
+import re
+import threading
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import unquote
+
+from config import PGN_WORKERS
+import metrics
+
+log = logging.getLogger(__name__)
+
+# Por debajo de este número de PGN por analizar, el envío a otros procesos cuesta más que el análisis
+PARALLEL_MIN_GAMES = 200
+
+_HEADER_RE = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]')
+_HEADERS_END_RE = re.compile(r"\r?\n\r?\n")
+_COMMENT_RE = re.compile(r"\{[^}]*\}|;[^\n]*")
+_VARIATION_RE = re.compile(r"\([^()]*\)")
+# Una jugada en notación algebraica (SAN); los números de jugada, NAGs y el resultado no encajan
+_SAN_RE = re.compile(r"[NBRQK]?[a-h]?[1-8]?x?[a-h][1-8](?:=[NBRQ])?|O-O(?:-O)?|0-0(?:-0)?")
+
+
+def opening_from_url(url: str | None) -> str | None:
+    """
+    'https://www.chess.com/openings/Sicilian-Defense-Najdorf' -> 'Sicilian Defense Najdorf'
+    """
+    if not url:
+        return None
+    slug = unquote(url.rstrip("/").rsplit("/", 1)[-1])
+    return slug.replace("-", " ") or None
+
+
+def parse_pgn(pgn: str) -> tuple[str | None, str | None, int | None]:
+    """
+    (eco, apertura, jugadas) de un PGN. 'jugadas' son jugadas completas (blancas + negras),
+    como el último número de jugada; None si la partida no tiene movimientos.
+    La apertura sale de la cabecera Opening o, en los PGN de Chess.com, de ECOUrl.
+    """
+    parts = _HEADERS_END_RE.split(pgn, maxsplit=1)
+    head, moves = (parts[0], parts[1]) if len(parts) == 2 else ("", pgn)
+    headers = dict(_HEADER_RE.findall(head))
+
+    if "{" in moves or ";" in moves:
+        moves = _COMMENT_RE.sub(" ", moves)
+    while "(" in moves:
+        # Variantes (anidadas): se quitan de dentro hacia fuera
+        stripped = _VARIATION_RE.sub(" ", moves)
+        if stripped == moves:
+            break
+        moves = stripped
+    plies = len(_SAN_RE.findall(moves))
+
+    opening = headers.get("Opening") or opening_from_url(headers.get("ECOUrl"))
+    return headers.get("ECO") or None, opening, (plies + 1) // 2 if plies else None
+
+
+def parse_pgns(pgns: list[str]) -> list[tuple[str | None, str | None, int | None]]:
+    """
+    parse_pgn de una lista (la unidad de trabajo que se envía a cada proceso del pool).
+    """
+    return [parse_pgn(pgn) for pgn in pgns]
+
+
+def pgn_hash(pgn: str) -> str:
+    return hashlib.blake2b(pgn.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class PgnEnricher:
+    """
+    Completa las filas de 'chess_records' de un lote con eco / opening / moves.
+    Es seguro usar uno solo desde varios hilos (p.ej. varias cuentas en paralelo en el CLI).
+    Usar con 'with' (o close()) para terminar los procesos del pool.
+    """
+
+    def __init__(self, workers: int = PGN_WORKERS):
+        self.workers = workers
+        self._pool: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "PgnEnricher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # 'spawn' en todas las plataformas: hacer fork de un proceso con hilos
+                # (descargas, interfaz) no es seguro
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def parse_many(self, pgns: list[str]) -> list[tuple[str | None, str | None, int | None]]:
+        """
+        parse_pgn de cada PGN, repartidos en un trozo por proceso si son suficientes.
+        """
+        if self.workers <= 1 or len(pgns) < PARALLEL_MIN_GAMES:
+            return parse_pgns(pgns)
+        size = -(-len(pgns) // self.workers)
+        try:
+            parts = self._get_pool().map(parse_pgns, [pgns[i:i + size] for i in range(0, len(pgns), size)])
+            return [info for part in parts for info in part]
+        except BrokenProcessPool:
+            # Un proceso del pool murió (p.ej. sin memoria): se sigue en este proceso
+            log.warning("El pool de análisis de PGN se detuvo; se continúa sin procesos auxiliares")
+            self.workers = 1
+            self.close()
+            return parse_pgns(pgns)
+
+    def enrich(self, session, rows: list[dict], games: Iterable[dict]) -> None:
+        """
+        Agrega eco / opening / moves a cada fila (en el lugar) desde el PGN de su partida en
+        'games' (el lote descargado). Solo se analizan los PGN que no están en la caché;
+        los nuevos se guardan en ella (en la transacción de 'session').
+        """
+        from models import read_pgn_cache, store_pgn_cache # diferido: los procesos del pool no lo necesitan
+
+        by_key = {g.get("uuid") or g.get("url"): g for g in games}
+        sources, pgns = [], {} # (hash, partida) por fila; hash -> PGN
+        for row in rows:
+            game = by_key.get(row["game_uuid"])
+            pgn = game.get("pgn") if game else None
+            h = pgn_hash(pgn) if pgn else None
+            if h is not None:
+                pgns[h] = pgn
+            sources.append((h, game))
+
+        known = read_pgn_cache(session, pgns)
+        missing = [h for h in pgns if h not in known]
+        if missing:
+            parsed = dict(zip(missing, self.parse_many([pgns[h] for h in missing])))
+            store_pgn_cache(session, parsed)
+            known.update(parsed)
+        metrics.incr("pgn.parsed", len(missing))
+        metrics.incr("pgn.cache_hits", len(pgns) - len(missing))
+
+        for row, (h, game) in zip(rows, sources):
+            eco, opening, moves = known.get(h, (None, None, None))
+            row["eco"] = eco
+            # Sin apertura en el PGN: la URL 'eco' de la API de Chess.com
+            row["opening"] = opening or opening_from_url(game.get("eco") if game else None)
+            row["moves"] = moves
@@ -0,0 +1,124 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+class TokenBucket:
+    """
+    Limitador de ritmo (token bucket) compartido entre hilos: 'rate' peticiones por segundo
+    de media, con ráfagas de hasta 'burst'. pause_until() detiene a todos (p.ej. Retry-After).
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """
+        Toma un token si lo hay (devuelve 0) o devuelve cuánto hay que esperar.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, abort: threading.Event | None = None) -> bool:
+        """
+        Espera hasta obtener un token. False si 'abort' se activó mientras esperaba.
+        """
+        if self.rate <= 0:
+            return True # sin límite
+        while (delay := self._reserve()) > 0:
+            if abort is not None:
+                if abort.wait(delay):
+                    return False
+            else:
+                time.sleep(delay)
+        return True
+
+    def pause_until(self, deadline: float) -> None:
+        """
+        Nadie obtiene tokens hasta 'deadline' (time.monotonic()).
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, deadline)
+            self._tokens = 0.0
+
+
+class AdaptiveConcurrency:
+    """
+    Tope de peticiones simultáneas que se adapta (AIMD, como el control de congestión de TCP):
+    - cada respuesta sana lo sube en 1/limit (≈ +1 por "ronda" de peticiones)
+    - cada señal de saturación (429, 503...) lo reduce a la mitad, como mucho una vez
+      por 'cooldown' segundos para que una ráfaga de errores no lo hunda de golpe
+    """
+
+    def __init__(self, maximum: int, minimum: int = 1, cooldown: float = 2.0):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = float(self.maximum)
+        self.cooldown = cooldown
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, abort: threading.Event | None = None) -> bool:
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                if abort is not None and abort.is_set():
+                    return False
+                self._cond.wait(timeout=0.5)
+            self._in_flight += 1
+            return True
+
+    def release(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    def on_success(self) -> None:
+        with self._cond:
+            if self.limit < self.maximum:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                self._cond.notify_all()
+
+    def on_throttle(self) -> None:
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self.limit = max(self.minimum, self.limit / 2)
+                self._last_decrease = now
+
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """
+    Cabecera Retry-After en segundos: admite "120" o una fecha HTTP. None si falta o no es válida.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """
+    Espera exponencial con jitter completo: aleatoria entre 0 y min(cap, base * 2^attempt).
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
@@ -0,0 +1,342 @@
+"""
+Exportación / importación en bloque de 'chess_records' (CSV o JSONL, opcionalmente .gz).
+
+Todo va en streaming por bloques, con memoria constante:
+- PostgreSQL: COPY ... TO STDOUT al exportar CSV; al importar, COPY a una tabla temporal y
+  un INSERT ... SELECT que descarta los repetidos, todo en el servidor.
+- Otros motores: cursor de servidor (yield_per) al exportar; executemany por bloques al importar.
+Se exportan las columnas de datos, no el id (los ids son propios de cada base de datos).
+Las columnas del PGN / ratings son opcionales al importar (archivos de versiones anteriores).
+Al importar se omiten las partidas que ya existen: por (username, game_uuid) y, en los
+registros sin game_uuid (manuales), por (opponent, result, date) contando repeticiones.
+"""
+import csv
+import datetime as dt
+import gzip
+import io
+import json
+import sys
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from typing import TextIO
+
+from sqlalchemy import String, cast, func, insert, or_, select, text
+
+import metrics
+from models import ChessRecord, existing_game_uuids, rebuild_stats
+
+REQUIRED_FIELDS = ("opponent", "result", "date", "game_uuid", "username")
+FIELDS = REQUIRED_FIELDS + ("eco", "opening", "time_class", "moves", "rating", "opponent_rating")
+INT_FIELDS = ("moves", "rating", "opponent_rating")
+FORMATS = ("csv", "jsonl")
+CHUNK_SIZE = 10000 # filas por bloque (lectura, dedup e inserción)
+_encode_json = json.JSONEncoder(ensure_ascii=False).encode # json.dumps(**kw) crea un encoder por llamada
+GZIP_LEVEL = 6 # el 9 por defecto de gzip.open cuesta ~3x más tiempo para apenas menos tamaño
+
+
+@dataclass
+class ImportStats:
+    """
+    Contadores de una importación.
+    """
+    read: int = 0
+    inserted: int = 0
+
+    @property
+    def duplicates(self) -> int:
+        return self.read - self.inserted
+
+
+def detect_format(path: str) -> str:
+    """
+    'csv' o 'jsonl' según la extensión (admite .gz). ValueError si no se reconoce.
+    """
+    name = path.lower().removesuffix(".gz")
+    for fmt in FORMATS:
+        if name.endswith("." + fmt):
+            return fmt
+    raise ValueError(f"No se reconoce el formato de '{path}' (usa .csv / .jsonl o indica el formato)")
+
+
+def open_records_file(path: str, mode: str) -> TextIO:
+    """
+    Abre 'path' en modo texto ('r' / 'w'); '-' es stdin/stdout y '.gz' se (des)comprime al vuelo.
+    """
+    if path == "-":
+        stream = sys.stdin if mode == "r" else sys.stdout
+        return io.TextIOWrapper(stream.buffer, encoding="utf-8", newline="", write_through=True)
+    if path.lower().endswith(".gz"):
+        return gzip.open(path, mode + "t", compresslevel=GZIP_LEVEL, encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+# --- Exportación ---
+
+def export_records(session, fp: TextIO, fmt: str) -> int:
+    """
+    Escribe todas las partidas (en orden de id) en 'fp'. Devuelve cuántas.
+    """
+    if fmt == "csv" and session.get_bind().dialect.name == "postgresql":
+        return _copy_out(session, fp)
+
+    # Core (sin la capa ORM) con cursor en streaming: tuplas tal cual, por bloques.
+    # La fecha sale ya como texto 'YYYY-MM-DD' (sin convertir a date y de vuelta)
+    cols = [ChessRecord.__table__.c[f] for f in FIELDS]
+    cols[FIELDS.index("date")] = cast(ChessRecord.date, String)
+    stmt = select(*cols).order_by(ChessRecord.id)
+    result = session.connection().execution_options(yield_per=CHUNK_SIZE).execute(stmt)
+    total = 0
+    if fmt == "csv":
+        writer = csv.writer(fp)
+        writer.writerow(FIELDS)
+        for chunk in result.partitions():
+            writer.writerows(chunk)
+            total += len(chunk)
+        return total
+
+    for chunk in result.partitions():
+        fp.write("".join(_encode_json(dict(zip(FIELDS, row))) + "\n" for row in chunk))
+        total += len(chunk)
+    return total
+
+
+def _copy_out(session, fp: TextIO) -> int:
+    cursor = session.connection().connection.dbapi_connection.cursor()
+    with metrics.phase("copy"):
+        cursor.copy_expert(
+            f"COPY (SELECT {', '.join(FIELDS)} FROM chess_records ORDER BY id) TO STDOUT WITH (FORMAT csv, HEADER true)",
+            fp,
+        )
+    return cursor.rowcount
+
+
+# --- Importación ---
+
+def _parse_int(value, field: str, line: int) -> int | None:
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Línea {line}: {field} no válido {value!r} (se espera un entero)") from None
+
+
+def _parse_date(value: str | None, line: int) -> dt.date | None:
+    if not value:
+        return None
+    try:
+        return dt.date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Línea {line}: fecha no válida {value!r} (se espera YYYY-MM-DD)") from None
+
+
+def iter_record_rows(fp: TextIO, fmt: str) -> Iterator[dict]:
+    """
+    Filas del archivo como dicts con FIELDS (cadenas vacías -> None, fecha -> date, enteros -> int).
+    El CSV debe tener cabecera con al menos REQUIRED_FIELDS; las columnas desconocidas se ignoran.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(fp)
+        missing = set(REQUIRED_FIELDS) - set(reader.fieldnames or ())
+        if missing:
+            raise ValueError(f"Faltan columnas en el CSV: {', '.join(sorted(missing))}")
+        items = ((reader.line_num, item) for item in reader)
+    else:
+        items = ((n, json.loads(line)) for n, line in enumerate(fp, start=1) if line.strip())
+
+    for line, item in items:
+        row = {f: (item.get(f) or None) for f in FIELDS}
+        row["date"] = _parse_date(row["date"], line)
+        for f in INT_FIELDS:
+            row[f] = _parse_int(row[f], f, line)
+        yield row
+
+
+def _chunks(rows: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _manual_counts(session, keys: set[tuple]) -> Counter:
+    """
+    Cuántos registros sin game_uuid hay ya por (opponent, result, date) entre las claves dadas
+    (fecha vacía incluida).
+    """
+    dates = {d for _, _, d in keys}
+    date_match = [ChessRecord.date.in_(dates - {None})]
+    if None in dates:
+        date_match.append(ChessRecord.date.is_(None))
+    stmt = (
+        select(ChessRecord.opponent, ChessRecord.result, ChessRecord.date, func.count())
+        .where(ChessRecord.game_uuid.is_(None), or_(*date_match))
+        .group_by(ChessRecord.opponent, ChessRecord.result, ChessRecord.date)
+    )
+    return Counter({(opp, res, d): n for opp, res, d, n in session.execute(stmt) if (opp, res, d) in keys})
+
+
+class _Deduper:
+    """
+    Decide qué filas de cada bloque son nuevas. Para las que no tienen game_uuid recuerda, entre
+    bloques, cuántas veces ha aparecido cada (opponent, result, date) en el archivo y cuántas se
+    han insertado: la n-ésima aparición solo entra si antes de importar había menos de n iguales.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.seen = Counter()
+        self.inserted = Counter()
+
+    def new_rows(self, rows: list[dict]) -> list[dict]:
+        """
+        Las filas del bloque que aún no están en la BD, en el orden del archivo.
+        """
+        uuids_by_user: dict[str, list[str]] = {}
+        manual_keys = set()
+        for row in rows:
+            if row["game_uuid"]:
+                uuids_by_user.setdefault(row["username"], []).append(row["game_uuid"])
+            else:
+                manual_keys.add((row["opponent"], row["result"], row["date"]))
+        known = {
+            username: existing_game_uuids(self.session, username, uuids)
+            for username, uuids in uuids_by_user.items()
+        }
+        existing = _manual_counts(self.session, manual_keys) if manual_keys else Counter()
+
+        new_rows = []
+        added = Counter()
+        for row in rows:
+            if row["game_uuid"]:
+                user_known = known[row["username"]]
+                if row["game_uuid"] in user_known:
+                    continue
+                user_known.add(row["game_uuid"])
+            else:
+                key = (row["opponent"], row["result"], row["date"])
+                self.seen[key] += 1
+                if self.seen[key] <= existing[key] - self.inserted[key]:
+                    continue
+                added[key] += 1
+            new_rows.append(row)
+        self.inserted.update(added)
+        return new_rows
+
+
+def import_records(session, fp: TextIO, fmt: str) -> ImportStats:
+    """
+    Importa las partidas de 'fp' omitiendo las que ya existen. No hace commit: la importación
+    entera es una transacción de quien llama. 'record_stats' se recalcula una vez al final
+    (con consultas agrupadas), más barato que actualizarlo bloque a bloque en una carga masiva.
+    """
+    rows = iter_record_rows(fp, fmt)
+    if session.get_bind().dialect.name == "postgresql":
+        return _copy_in(session, rows)
+
+    stats = ImportStats()
+    deduper = _Deduper(session)
+    for chunk in _chunks(metrics.timed_iter(rows, "read"), CHUNK_SIZE):
+        stats.read += len(chunk)
+        with metrics.phase("dedup"):
+            chunk = deduper.new_rows(chunk)
+        if chunk:
+            with metrics.phase("insert"):
+                session.execute(insert(ChessRecord.__table__), chunk)
+            stats.inserted += len(chunk)
+    if stats.inserted:
+        with metrics.phase("stats"):
+            rebuild_stats(session)
+    return stats
+
+
+class _CsvStream(io.TextIOBase):
+    """
+    Archivo de solo lectura que produce las filas como CSV bajo demanda (entrada de COPY FROM STDIN).
+    """
+
+    def __init__(self, rows: Iterable[dict]):
+        self._chunks = _chunks(rows, CHUNK_SIZE)
+        self._buffer = ""
+        self.count = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            out = io.StringIO()
+            csv.writer(out).writerows([row[f] for f in FIELDS] for row in chunk)
+            self._buffer += out.getvalue()
+            self.count += len(chunk)
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _copy_in(session, rows: Iterable[dict]) -> ImportStats:
+    """
+    PostgreSQL: COPY a una tabla temporal y, ya en el servidor, INSERT ... SELECT de las nuevas.
+    """
+    conn = session.connection()
+    conn.execute(text(
+        "CREATE TEMP TABLE chess_records_import ("
+        " ord BIGSERIAL, opponent VARCHAR, result VARCHAR, date DATE, game_uuid VARCHAR, username VARCHAR,"
+        " eco VARCHAR, opening VARCHAR, time_class VARCHAR, moves INTEGER, rating INTEGER, opponent_rating INTEGER"
+        ") ON COMMIT DROP"
+    ))
+    stream = _CsvStream(rows)
+    with metrics.phase("copy"):
+        conn.connection.dbapi_connection.cursor().copy_expert(
+            f"COPY chess_records_import ({', '.join(FIELDS)}) FROM STDIN WITH (FORMAT csv)", stream
+        )
+
+    cols = ", ".join(FIELDS)
+    with metrics.phase("insert"):
+        # Un solo INSERT ordenado por 'ord' para que los ids sigan el orden del archivo (como en
+        # los demás motores); las tres ramas son disjuntas:
+        # - con game_uuid y username: el índice único decide (también entre filas repetidas del archivo)
+        # - con game_uuid sin username: el índice único trata los NULL como distintos, así que se
+        #   comparan a mano (como en los demás motores: existing_game_uuids con username IS NULL)
+        # - sin game_uuid: la n-ésima fila igual del archivo solo entra si la BD tiene menos de n
+        inserted = conn.execute(text(
+            f"INSERT INTO chess_records ({cols})"
+            f" SELECT {cols} FROM ("
+            f"   SELECT ord, {cols} FROM chess_records_import"
+            "   WHERE game_uuid IS NOT NULL AND username IS NOT NULL"
+            "   UNION ALL"
+            f"   SELECT ord, {cols} FROM ("
+            "     SELECT DISTINCT ON (game_uuid) * FROM chess_records_import"
+            "     WHERE game_uuid IS NOT NULL AND username IS NULL ORDER BY game_uuid, ord"
+            "   ) u"
+            "   WHERE NOT EXISTS ("
+            "     SELECT 1 FROM chess_records c WHERE c.username IS NULL AND c.game_uuid = u.game_uuid"
+            "   )"
+            "   UNION ALL"
+            f"   SELECT ord, {cols} FROM ("
+            "     SELECT i.*, ROW_NUMBER() OVER (PARTITION BY opponent, result, date ORDER BY ord) AS n"
+            "     FROM chess_records_import i WHERE game_uuid IS NULL"
+            "   ) m"
+            "   WHERE m.n > ("
+            "     SELECT COUNT(*) FROM chess_records c WHERE c.game_uuid IS NULL"
+            "     AND (c.date = m.date OR (c.date IS NULL AND m.date IS NULL))"
+            "     AND c.opponent IS NOT DISTINCT FROM m.opponent AND c.result IS NOT DISTINCT FROM m.result"
+            "   )"
+            " ) i"
+            " ORDER BY ord"
+            " ON CONFLICT (username, game_uuid) DO NOTHING"
+        )).rowcount
+
+    if inserted:
+        with metrics.phase("stats"):
+            rebuild_stats(session)
+    return ImportStats(read=stream.count, inserted=inserted)
@@ -0,0 +1,84 @@
+"""
+Copia local de lo último que mostró la vista (primera página y totales), para pintarla
+al arrancar sin esperar a la base de datos.
+
+El archivo es un JSON pequeño (una página, unos pocos KB) con un sello de versión:
+el formato del archivo y la base de datos de la que salió (un hash de su URL, sin
+guardar credenciales). Si no coincide con la configuración actual se ignora.
+No importa SQLAlchemy: leerlo no retrasa el primer pintado.
+"""
+import datetime as dt
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+
+from config import DATABASE_URL, VIEW_SNAPSHOT_PATH
+
+log = logging.getLogger(__name__)
+
+# Subir si cambia el formato de las filas guardadas: las copias anteriores se descartan
+SNAPSHOT_VERSION = 1
+
+
+def _db_stamp(url: str = DATABASE_URL) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class ViewSnapshot:
+    """
+    Primera página de la vista (tuplas (id, date, opponent, result), como fetch_records_page)
+    y totales por resultado, tal como estaban al guardarse.
+    """
+    rows: list[tuple]
+    totals: dict[str, int]
+    saved_at: str = ""
+
+
+def load_snapshot(path: str = VIEW_SNAPSHOT_PATH) -> ViewSnapshot | None:
+    """
+    La copia guardada, o None si no hay, está dañada o es de otra versión / otra BD.
+    """
+    if not path:
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != SNAPSHOT_VERSION or data.get("db") != _db_stamp():
+            return None
+        rows = [
+            (int(rec_id), dt.date.fromisoformat(d) if d else None, opp, res)
+            for rec_id, d, opp, res in data["rows"]
+        ]
+        return ViewSnapshot(rows, {k: int(v) for k, v in data["totals"].items()}, data.get("saved_at", ""))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        log.warning("Copia de la vista no válida %s (%s); se ignora", path, e)
+        return None
+
+
+def save_snapshot(rows: list[tuple], totals: dict[str, int], path: str = VIEW_SNAPSHOT_PATH) -> None:
+    """
+    Guarda la copia (reemplazo atómico: un corte a medias deja la anterior intacta).
+    Los errores de disco solo se registran: la copia es prescindible.
+    """
+    if not path:
+        return
+    data = {
+        "version": SNAPSHOT_VERSION,
+        "db": _db_stamp(),
+        "saved_at": dt.datetime.now().isoformat(timespec="seconds"),
+        "totals": totals,
+        "rows": [[rec_id, d.isoformat() if d else "", opp, res] for rec_id, d, opp, res in rows],
+    }
+    tmp = f"{path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+    except OSError as e:
+        log.warning("No se pudo guardar la copia de la vista en %s: %s", path, e)